@@ -0,0 +1,67 @@
+"""
+Per value cost of `gen.one_of` and `gen.frequency`, compared to picking with `r.choice` and `iter` on every draw.
+
+    python benchmarks/bench_one_of.py
+"""
+import time
+import typing
+
+from johen.generators import specialized
+from johen.random import gen
+
+
+def legacy_one_of(*options: typing.Iterable) -> typing.Iterator:
+    # The implementation prior to skipping `iter` on options, which are always iterators once normalized.
+    composed_options = [gen._normalize(i) for i in options]
+    return map(lambda r: next(iter(r.choice(composed_options))), gen)
+
+
+def legacy_ints():
+    return legacy_one_of(specialized.unsigned_ints, specialized.negative_ints, (0,))
+
+
+def legacy_json_primitives():
+    return legacy_one_of(
+        specialized.ascii_words, legacy_ints(), specialized.bools, specialized.valid_floats, [None]
+    )
+
+
+def current_ints():
+    return gen.one_of(specialized.unsigned_ints, specialized.negative_ints, (0,))
+
+
+def current_json_primitives():
+    return gen.one_of(
+        specialized.ascii_words, current_ints(), specialized.bools, specialized.valid_floats, [None]
+    )
+
+
+def duplicated_colors():
+    # Weighting by duplicating items, as `specialized.colors` does for "magenta".
+    return gen.one_of(["red"] * 90 + ["green"] * 9 + ["blue"])
+
+
+def weighted_colors():
+    return gen.frequency((90, ["red"]), (9, ["green"]), (1, ["blue"]))
+
+
+def bench(name: str, build: typing.Callable[[], typing.Iterator], n: int = 100000, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        gen.restart_at_index(1, 0)
+        gen.session.remaining_iterations = 1 << 62
+        iterator = build()
+        started = time.perf_counter()
+        for _ in range(n):
+            next(iterator)
+        best = min(best, time.perf_counter() - started)
+    print(f"{name:28s} {best / n * 1e9:8.1f}ns/value")
+
+
+if __name__ == "__main__":
+    bench("legacy ints", legacy_ints)
+    bench("current ints", current_ints)
+    bench("legacy json_primitives", legacy_json_primitives)
+    bench("current json_primitives", current_json_primitives)
+    bench("duplicated colors", duplicated_colors)
+    bench("frequency colors", weighted_colors)
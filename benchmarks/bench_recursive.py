@@ -0,0 +1,47 @@
+"""
+Time and size distribution of generating recursive values, for a few `size` settings.
+
+    python benchmarks/bench_recursive.py
+"""
+import statistics
+import time
+
+from johen import generate, global_config, replace_global_config
+from johen.generators.specialized import JsonDict, JsonValue
+
+N = 20000
+
+
+def nodes(value) -> int:
+    if isinstance(value, dict):
+        return 1 + sum(nodes(v) for v in value.values())
+    if isinstance(value, list):
+        return 1 + sum(nodes(v) for v in value)
+    return 1
+
+
+def bench(size: int):
+    with replace_global_config({**global_config, "size": size}):
+        iterator = generate(
+            JsonValue, seed=1, globals={"JsonDict": JsonDict, "JsonValue": JsonValue}
+        )
+        times: list[float] = []
+        sizes: list[int] = []
+        for _ in range(N):
+            started = time.perf_counter()
+            value = next(iterator)
+            times.append(time.perf_counter() - started)
+            sizes.append(nodes(value))
+
+    q = statistics.quantiles(times, n=100)
+    print(
+        f"size {size:4d}: {statistics.fmean(times) * 1e6:8.1f}us mean {q[49] * 1e6:8.1f}us p50"
+        f" {q[98] * 1e6:8.1f}us p99 {max(times) * 1e6:9.1f}us max,"
+        f" nodes {statistics.fmean(sizes):6.1f} mean {max(sizes):5d} max"
+    )
+
+
+if __name__ == "__main__":
+    global_config["max_iterations"] = 1 << 62
+    for size in (10, 30, 100):
+        bench(size)
@@ -0,0 +1,47 @@
+"""
+Per example reseeding overhead of `gen`, and its effect on generating many small examples.
+
+    python benchmarks/bench_reseed.py
+"""
+import random
+import timeit
+
+from johen.generators.specialized import bools, ints
+from johen.random import GenerationSession, gen
+
+N = 20000
+
+
+def legacy_restart_at_next_seed(g: GenerationSession):
+    # The reseeding prior to reusing scratch instances and optional splitmix64 backends.
+    g.r = random.Random(g.last_seed)
+    g.last_seed = g.r.getrandbits(64)
+    g.r = random.Random(g.last_seed)
+
+
+def bench_reseed():
+    g = GenerationSession()
+    g.restart_at(1)
+    legacy = min(timeit.repeat(lambda: legacy_restart_at_next_seed(g), number=N, repeat=5)) / N
+    print(f"reseed legacy:     {legacy * 1e6:6.2f}us")
+    for prng in ("mersenne", "splitmix64"):
+        g = GenerationSession()
+        g.restart_at_index(1, 0, "chained", prng)  # type: ignore
+        t = min(timeit.repeat(g.restart_at_next_seed, number=N, repeat=5)) / N
+        print(f"reseed {prng + ':':11s} {t * 1e6:6.2f}us")
+
+
+def bench_examples():
+    for name, source in (("bools", bools), ("ints", ints)):
+        for prng in ("mersenne", "splitmix64"):
+            for strategy in ("chained", "indexed"):
+                iterator = gen.wrap_deterministically(
+                    source, seed=1, max_iterations=100, strategy=strategy, prng=prng  # type: ignore
+                )
+                t = min(timeit.repeat(lambda: next(iterator), number=N, repeat=5)) / N
+                print(f"{name:5s} {prng:10s} {strategy:7s} {t * 1e6:6.2f}us/example")
+
+
+if __name__ == "__main__":
+    bench_reseed()
+    bench_examples()
@@ -0,0 +1,46 @@
+"""
+Per call overhead of `sometimes`, compared to resolving its call site with `inspect.getouterframes`.
+
+    python benchmarks/bench_sometimes.py
+"""
+import inspect
+import time
+from collections import defaultdict
+
+from johen.pytest import Sometimes
+from johen.random import gen
+
+
+class LegacySometimes:
+    # The call site resolution and seed sets prior to code object keys and index bitsets.
+    def __init__(self):
+        self.calls = defaultdict(lambda: (set(), set()))
+
+    def __call__(self, cond):
+        frameinfo = inspect.getouterframes(inspect.currentframe())[1]
+        hits, misses = self.calls[(frameinfo.filename, frameinfo.lineno)]
+        (hits if cond else misses).add(gen.last_seed)
+        return True
+
+
+def nested(depth: int, fn):
+    # Call sites are usually some frames below pytest's own, which getouterframes walks in full.
+    if depth:
+        return nested(depth - 1, fn)
+    return fn()
+
+
+def bench(depth: int):
+    # The legacy implementation reads source context from disk on each call, it is sampled far less.
+    for name, sometimes, n in (("legacy", LegacySometimes(), 500), ("current", Sometimes(), 50000)):
+        started = time.perf_counter()
+        for i in range(n):
+            nested(depth, lambda: sometimes(i % 2))
+        t = time.perf_counter() - started
+        print(f"depth {depth:3d} {name:8s} {t / n * 1e6:8.2f}us/call")
+
+
+if __name__ == "__main__":
+    gen.restart_at_index(1, 0)
+    for depth in (0, 30):
+        bench(depth)
@@ -0,0 +1,41 @@
+"""
+Throughput of the primitives of `specialized`, compared to their numpy backed `vectorized` equivalents, handed out
+one value at a time or drawn as whole arrays.
+
+    python benchmarks/bench_vectorized.py
+"""
+import time
+
+from johen.generators import specialized, vectorized
+from johen.random import gen
+
+N = 200_000
+
+
+def per_second(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return N / (time.perf_counter() - started)
+
+
+def bench(name: str, legacy, blocks: vectorized.Blocks):
+    gen.restart_at(1)
+    gen.session.remaining_iterations = 1 << 62
+    one_at_a_time = per_second(lambda: [v for v, _ in zip(legacy, range(N))])
+    buffered = per_second(lambda: [v for v, _ in zip(blocks, range(N))])
+    arrays = per_second(lambda: blocks.array(N))
+    print(
+        f"{name:20s} specialized {one_at_a_time:11.0f}/s  vectorized {buffered:11.0f}/s"
+        f"  arrays {arrays:13.0f}/s"
+    )
+
+
+if __name__ == "__main__":
+    bench("unsigned_ints", specialized.unsigned_ints, vectorized.unsigned_ints)
+    bench("ints", specialized.ints, vectorized.ints)
+    bench("valid_floats", specialized.valid_floats, vectorized.valid_floats)
+    bench("bools", specialized.bools, vectorized.bools)
+    bench("uuids", specialized.uuids, vectorized.uuids)
+    bench("dates", specialized.dates, vectorized.dates)
+    bench("datetimes", specialized.datetimes, vectorized.datetimes)
+    bench("positive_timedeltas", specialized.positive_timedeltas, vectorized.positive_timedeltas)
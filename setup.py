@@ -24,5 +24,8 @@ setup(
         "Programming Language :: Python :: 3.10",
         "Topic :: Software Development",
     ],
-    entry_points={"pytest11": ["johen = johen.pytest"]},
+    entry_points={
+        "pytest11": ["johen = johen.pytest"],
+        "console_scripts": ["johen = johen.cli:main"],
+    },
 )
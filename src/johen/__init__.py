@@ -1,12 +1,17 @@
+from johen.batch import generate_batch, generate_columns
 from johen.change_watcher import change_watcher
 from johen.exc import GenerationError
 from johen.globals import generate, global_config, replace_global_config
+from johen.parallel import generate_parallel
 from johen.random import gen
 
 __all__ = [
     "gen",
     "global_config",
     "generate",
+    "generate_parallel",
+    "generate_batch",
+    "generate_columns",
     "replace_global_config",
     "change_watcher",
     "GenerationError",
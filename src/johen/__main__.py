@@ -0,0 +1,5 @@
+import sys
+
+from johen.cli import main
+
+sys.exit(main())
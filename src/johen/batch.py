@@ -0,0 +1,500 @@
+import array
+import collections
+import dataclasses
+import datetime
+import math
+import random
+import string
+import struct
+import typing
+import uuid
+from typing import Any, Callable, Literal
+
+from johen.config import TypeMatchers
+from johen.examples import Examples
+from johen.exc import GenerationError
+from johen.generators import base, specialized
+from johen.generators.annotations import AnnotationMatcher, AnnotationProcessingContext
+from johen.globals import generation_context, global_config
+from johen.random import AliasTable, GenerationSession, gen
+
+__all__ = [
+    "generate_batch",
+    "generate_columns",
+    "compile_columns",
+    "Columns",
+    "Batcher",
+    "batched_leaves",
+]
+
+# Produces the given number of values, drawing from the given random.
+Batcher = Callable[[random.Random, int], list[Any]]
+
+_widths = [2**i for i in range(7)]
+_exhausted = object()
+
+
+def _unsigned_ints(r: random.Random, n: int) -> list[int]:
+    getrandbits = r.getrandbits
+    return [getrandbits(w) for w in r.choices(_widths, k=n)]
+
+
+def _negative_ints(r: random.Random, n: int) -> list[int]:
+    return [-i for i in _unsigned_ints(r, n)]
+
+
+def _ints(r: random.Random, n: int) -> list[int]:
+    # Unsigned, negative or 0, as `specialized.ints`.
+    return [sign * i for sign, i in zip(r.choices((1, -1, 0), k=n), _unsigned_ints(r, n))]
+
+
+def _valid_floats(r: random.Random, n: int) -> list[float]:
+    result: list[float] = []
+    while len(result) < n:
+        missing = n - len(result)
+        bits = struct.pack(f"{missing}Q", *_unsigned_ints(r, missing))
+        result.extend(v for v in struct.unpack(f"{missing}d", bits) if math.isfinite(v))
+    return result
+
+
+def _bools(r: random.Random, n: int) -> list[bool]:
+    return r.choices((True, False), k=n)
+
+
+def _ascii_words(r: random.Random, n: int) -> list[str]:
+    return [
+        f"{color}-{name}-{thing}"
+        for color, name, thing in zip(
+            r.choices(specialized.color_words, k=n),
+            r.choices(specialized.name_words, k=n),
+            r.choices(specialized.thing_words, k=n),
+        )
+    ]
+
+
+def _printable_strings(r: random.Random, n: int) -> list[str]:
+    sample, printable = r.sample, string.printable
+    return ["".join(sample(printable, k)) for k in r.choices(range(7), k=n)]
+
+
+def _byte_strings(r: random.Random, n: int) -> list[bytes]:
+    return [s.encode("utf8") for s in _printable_strings(r, n)]
+
+
+def _uuids(r: random.Random, n: int) -> list[uuid.UUID]:
+    getrandbits, UUID = r.getrandbits, uuid.UUID
+    return [UUID(int=getrandbits(128), version=4) for _ in range(n)]
+
+
+def _dates(r: random.Random, n: int) -> list[datetime.date]:
+    start, timedelta = datetime.date(2013, 1, 1), datetime.timedelta
+    return [start + timedelta(days=d) for d in r.choices(range(365 * 20 + 1), k=n)]
+
+
+def _datetimes(r: random.Random, n: int) -> list[datetime.datetime]:
+    start, timedelta = datetime.datetime(2013, 1, 1, 1), datetime.timedelta
+    return [
+        start + timedelta(days=d, seconds=s, milliseconds=ms)
+        for d, s, ms in zip(
+            r.choices(range(365 * 20 + 1), k=n),
+            r.choices(range(60 * 60 * 24 + 1), k=n),
+            r.choices(range(1001), k=n),
+        )
+    ]
+
+
+def _positive_timedeltas(r: random.Random, n: int) -> list[datetime.timedelta]:
+    timedelta = datetime.timedelta
+    return [
+        timedelta(seconds=s, hours=h)
+        for s, h in zip(r.choices(range(60), k=n), r.choices(range(24), k=n))
+    ]
+
+
+def _nones(r: random.Random, n: int) -> list[None]:
+    return [None] * n
+
+
+def _objects(r: random.Random, n: int) -> list[object]:
+    return [object() for _ in range(n)]
+
+
+def _mixed(
+    r: random.Random, n: int, batchers: typing.Sequence[Batcher], table: AliasTable | None = None
+) -> list[Any]:
+    """
+    Picks one of batchers for each value, then asks each batcher for all of its values at once.
+    """
+    if table is None:
+        picks = r.choices(range(len(batchers)), k=n)
+    else:
+        picks = [table.pick(r) for _ in range(n)]
+    counts = collections.Counter(picks)
+    columns = {i: iter(batchers[i](r, count)) for i, count in sorted(counts.items())}
+    return [next(columns[i]) for i in picks]
+
+
+def _json_primitives(r: random.Random, n: int) -> list[Any]:
+    return _mixed(r, n, (_ascii_words, _ints, _bools, _valid_floats, _nones))
+
+
+# Batched equivalents of the iterators of `specialized`, by the iterator that `"type_matchers"` resolves to.  Leaves
+# without an entry are generated one value at a time.
+batched_leaves: dict[Any, Batcher] = {
+    specialized.unsigned_ints: _unsigned_ints,
+    specialized.negative_ints: _negative_ints,
+    specialized.ints: _ints,
+    specialized.valid_floats: _valid_floats,
+    specialized.bools: _bools,
+    specialized.ascii_words: _ascii_words,
+    specialized.printable_strings: _printable_strings,
+    specialized.byte_strings: _byte_strings,
+    specialized.uuids: _uuids,
+    specialized.dates: _dates,
+    specialized.datetimes: _datetimes,
+    specialized.positive_timedeltas: _positive_timedeltas,
+    specialized.nones: _nones,
+    specialized.objects: _objects,
+    specialized.json_primitives: _json_primitives,
+}
+
+
+def _included_keys(r: random.Random, n: int, optional_keys: list[str]) -> list[list[str]]:
+    # The optional keys included in each of n records, for generate_defaults="holes".
+    return [r.sample(optional_keys, r.randint(0, len(optional_keys))) for _ in range(n)]
+
+
+# Leaves whose values fit a fixed width, by their `array.array` typecode.
+_typecodes: dict[Any, str] = {
+    specialized.unsigned_ints: "Q",
+    specialized.valid_floats: "d",
+    specialized.bools: "b",
+}
+
+
+def _split(
+    flat: list[Any], lengths: list[int], constructor: Callable[[list[Any]], Any]
+) -> list[Any]:
+    result: list[Any] = []
+    offset = 0
+    for length in lengths:
+        result.append(constructor(flat[offset : offset + length]))
+        offset += length
+    return result
+
+
+@dataclasses.dataclass
+class _BatchCompiler:
+    """
+    Compiles an annotation into a `Batcher`, by the matcher its generation plan resolved to, so that the values of
+    each field or item are generated as one column.  Annotations handled by other matchers, or that are recursive,
+    are generated one value at a time from their usual iterator.
+    """
+
+    max_iterations: int
+
+    def compile(self, context: AnnotationProcessingContext) -> Batcher:
+        matcher = context.plan()
+        batcher: Batcher | None = None
+        if isinstance(matcher, TypeMatchers):
+            try:
+                batcher = batched_leaves.get(matcher(context))
+            except TypeError:
+                batcher = None
+        elif matcher is not None:
+            compile_matcher = self._compilers.get(matcher)
+            if compile_matcher is not None:
+                batcher = compile_matcher(self, context)
+        return batcher if batcher is not None else self.per_item(context)
+
+    def per_item(self, context: AnnotationProcessingContext) -> Batcher:
+        iterator = context.generate()
+        max_iterations = self.max_iterations
+
+        def batch(r: random.Random, n: int) -> list[Any]:
+            session = GenerationSession()
+            session.restart_at(r.getrandbits(64))
+            result: list[Any] = []
+            with session:
+                for _ in range(n):
+                    session.remaining_iterations = max_iterations
+                    value = next(iterator, _exhausted)
+                    if value is _exhausted:
+                        raise GenerationError(
+                            f"Could not generate {' '.join(context.path)} {context.source} within max_iterations"
+                        )
+                    result.append(value)
+            return result
+
+        return batch
+
+    def schema(self, context: AnnotationProcessingContext) -> base.ModelSchema | None:
+        """
+        The schema of a dataclass, NamedTuple or TypedDict, by the matcher its generation plan resolved to.
+        """
+        resolve = self._schemas.get(context.plan())  # type: ignore
+        return None if resolve is None else base.get_model_schema(context.source, resolve)
+
+    def record_keys(
+        self, context: AnnotationProcessingContext, schema: base.ModelSchema
+    ) -> tuple[list[str], list[str]]:
+        """
+        The keys that are generated, and which of them are optional, as in `generate_dicts_for_annotations`.
+        """
+        keys = [
+            k
+            for k in schema.annotations
+            if context.generate_defaults or k not in schema.optional_keys
+        ]
+        return keys, [k for k in keys if k in schema.optional_keys]
+
+    def records(self, context: AnnotationProcessingContext) -> Batcher | None:
+        schema = self.schema(context)
+        if schema is None:
+            return None
+        constructor = (
+            dict if context.plan() is base.generate_dicts_from_typeddict else context.source
+        )
+        keys, optional_keys = self.record_keys(context, schema)
+        columns = [self.compile(context.child(schema.annotations[k], k)) for k in keys]
+        holes = context.generate_defaults == "holes" and optional_keys
+
+        def batch(r: random.Random, n: int) -> list[Any]:
+            if not columns:
+                return [constructor() for _ in range(n)]
+            rows = [dict(zip(keys, row)) for row in zip(*(column(r, n) for column in columns))]
+            if holes:
+                for row, included in zip(rows, _included_keys(r, n, optional_keys)):
+                    for k in optional_keys:
+                        if k not in included:
+                            del row[k]
+            return [constructor(**row) for row in rows]
+
+        return batch
+
+    def column(
+        self, context: AnnotationProcessingContext, backend: Literal["array", "numpy"]
+    ) -> Callable[[random.Random, int], Any]:
+        """
+        Like `compile`, but fixed width primitives are drawn into an `array.array`, or a numpy array.
+        """
+        leaf = None
+        matcher = context.plan()
+        if isinstance(matcher, TypeMatchers):
+            leaf = matcher(context)
+
+        try:
+            if backend == "numpy":
+                import numpy as np
+
+                from johen.generators import vectorized
+
+                draw = vectorized.leaf_arrays.get(leaf)
+                if (
+                    draw is None
+                    and isinstance(leaf, vectorized.Blocks)
+                    and leaf.to_values is np.ndarray.tolist
+                ):
+                    draw = leaf.draw
+                if draw is not None:
+                    array_draw = draw
+                    return lambda r, n: array_draw(np.random.default_rng(r.getrandbits(64)), n)
+            elif (typecode := _typecodes.get(leaf)) is not None:
+                batcher = batched_leaves[leaf]
+                return lambda r, n: array.array(typecode, batcher(r, n))
+        except TypeError:
+            # Unhashable sources are not known leaves.
+            pass
+        return self.compile(context)
+
+    def lists_sets_frozen_sets(self, context: AnnotationProcessingContext) -> Batcher | None:
+        for constructor in (list, set, frozenset):
+            if context.concretely_implemented_by(constructor):
+                arg = next(iter(context.args), Any)
+                if base.is_recursive(arg):
+                    return None
+                items = self.compile(context.child(arg))
+                lengths = range(6 - context.recursive_depth)
+
+                def batch(r: random.Random, n: int) -> list[Any]:
+                    counts = r.choices(lengths, k=n)
+                    return _split(items(r, sum(counts)), counts, constructor)
+
+                return batch
+        return None
+
+    def dicts(self, context: AnnotationProcessingContext) -> Batcher | None:
+        key, value, *_ = (*context.args, str, str)
+        if base.is_recursive(value):
+            return None
+        keys = self.compile(context.child(key, "[Key]"))
+        values = self.compile(context.child(value, "[Value]"))
+        lengths = range(6 - context.recursive_depth)
+
+        def batch(r: random.Random, n: int) -> list[Any]:
+            counts = r.choices(lengths, k=n)
+            total = sum(counts)
+            return _split(list(zip(keys(r, total), values(r, total))), counts, dict)
+
+        return batch
+
+    def tuples(self, context: AnnotationProcessingContext) -> Batcher | None:
+        has_ellipsis = not context.args or Ellipsis in context.args
+        specified_parts = tuple(a for a in context.args if a is not Ellipsis)
+        columns = [
+            self.compile(context.child(arg, f"[{i}]")) for i, arg in enumerate(specified_parts)
+        ]
+        if has_ellipsis:
+            extension_type = [Any, *specified_parts][-1]
+            columns.append(self.compile(context.child(list, "...", (extension_type,))))
+
+        def batch(r: random.Random, n: int) -> list[Any]:
+            if not columns:
+                return [()] * n
+            values = [column(r, n) for column in columns]
+            if has_ellipsis:
+                return [(*specified, *unspecified) for *specified, unspecified in zip(*values)]
+            return list(zip(*values))
+
+        return batch
+
+    def unions(self, context: AnnotationProcessingContext) -> Batcher | None:
+        args = context.args
+        table = base.union_table(context)
+        # Members are compiled the first time they are picked, like `base.generate_unions` builds them.
+        members: dict[int, Batcher] = {}
+
+        def member(i: int) -> Batcher:
+            def batch(r: random.Random, n: int) -> list[Any]:
+                if i not in members:
+                    members[i] = self.compile(context.child(args[i], "|"))
+                return members[i](r, n)
+
+            return batch
+
+        batchers = [member(i) for i in range(len(args))]
+        return lambda r, n: _mixed(r, n, batchers, table)
+
+    def literals(self, context: AnnotationProcessingContext) -> Batcher | None:
+        values = list(context.args)
+        return lambda r, n: r.choices(values, k=n)
+
+    def enums(self, context: AnnotationProcessingContext) -> Batcher | None:
+        values = list(context.source)
+        return lambda r, n: r.choices(values, k=n)
+
+    def annotated(self, context: AnnotationProcessingContext) -> Batcher | None:
+        if any(isinstance(m, Examples) for m in context.args[1:]):
+            return None
+        return self.compile(context.child([*context.args, Any][0]))
+
+    _compilers: typing.ClassVar[
+        dict[
+            AnnotationMatcher,
+            Callable[["_BatchCompiler", AnnotationProcessingContext], Batcher | None],
+        ]
+    ] = {
+        base.generate_dataclass_instances: records,
+        base.generate_named_tuples: records,
+        base.generate_dicts_from_typeddict: records,
+        base.generate_lists_sets_frozen_sets: lists_sets_frozen_sets,
+        base.generate_dicts: dicts,
+        base.generate_tuples: tuples,
+        base.generate_unions: unions,
+        base.generate_literals: literals,
+        base.generate_enums: enums,
+        base.generate_annotated: annotated,
+    }
+    _schemas: typing.ClassVar[dict[AnnotationMatcher, Callable[[Any], base.ModelSchema]]] = {
+        base.generate_dataclass_instances: base.dataclass_schema,
+        base.generate_named_tuples: base.named_tuple_schema,
+        base.generate_dicts_from_typeddict: base.typeddict_schema,
+    }
+
+
+def generate_batch(
+    obj: Any,
+    n: int,
+    seed: int | None = None,
+    generate_defaults: bool | Literal["holes"] | None = None,
+    matchers: list[AnnotationMatcher] | None = None,
+    globals: dict[str, Any] | None = None,
+) -> list[Any]:
+    """
+    Generates n values of obj column wise: every field, item or leaf of obj is generated for all n values at once,
+    by drawing directly from a single `random.Random` instead of advancing the iterator tree once per value.
+    Deterministic for a given seed, but yields different values than `generate` does for the same seed.
+    """
+    context = generation_context(obj, generate_defaults, matchers, globals)
+    batcher = _BatchCompiler(global_config["max_iterations"]).compile(context)
+    if seed is None:
+        seed = gen.session.r.getrandbits(64)
+    return batcher(random.Random(seed), n)
+
+
+@dataclasses.dataclass
+class Columns:
+    """
+    Records generated by `generate_columns`, one column per generated key, in record order.
+    """
+
+    length: int
+    columns: dict[str, Any]
+    # For the optional keys of generate_defaults="holes", whether each record includes the key.  The values of a
+    # column where its mask is false were generated all the same, and are to be ignored.
+    masks: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+
+def compile_columns(
+    context: AnnotationProcessingContext, backend: Literal["array", "numpy"] = "array"
+) -> Callable[[random.Random, int], Columns]:
+    """
+    Compiles a dataclass, NamedTuple or TypedDict into a function drawing n of its records as `Columns`.
+    """
+    compiler = _BatchCompiler(global_config["max_iterations"])
+    schema = compiler.schema(context)
+    if schema is None:
+        raise GenerationError(
+            f"generate_columns requires a dataclass, NamedTuple or TypedDict, got {context.source}"
+        )
+
+    keys, optional_keys = compiler.record_keys(context, schema)
+    columns = {k: compiler.column(context.child(schema.annotations[k], k), backend) for k in keys}
+    holes = context.generate_defaults == "holes" and optional_keys
+
+    def batch(r: random.Random, n: int) -> Columns:
+        result = Columns(n, {k: column(r, n) for k, column in columns.items()})
+        if holes:
+            included = _included_keys(r, n, optional_keys)
+            for k in optional_keys:
+                mask = [k in row for row in included]
+                if backend == "numpy":
+                    import numpy as np
+
+                    result.masks[k] = np.array(mask, dtype=bool)
+                else:
+                    result.masks[k] = array.array("b", mask)
+        return result
+
+    return batch
+
+
+def generate_columns(
+    obj: Any,
+    n: int,
+    seed: int | None = None,
+    generate_defaults: bool | Literal["holes"] | None = None,
+    matchers: list[AnnotationMatcher] | None = None,
+    globals: dict[str, Any] | None = None,
+    backend: Literal["array", "numpy"] = "array",
+) -> Columns:
+    """
+    Generates n records of a dataclass, NamedTuple or TypedDict as columns, without building any record.  Columns
+    of fixed width primitives (unsigned ints, floats and bools, also dates, datetimes and timedeltas with numpy)
+    are an `array.array`, or a numpy array for the "numpy" backend, other columns are lists.  With the "array"
+    backend, columns hold the same values as the records `generate_batch` builds for the same seed.
+    """
+    batch = compile_columns(generation_context(obj, generate_defaults, matchers, globals), backend)
+    if seed is None:
+        seed = gen.session.r.getrandbits(64)
+    return batch(random.Random(seed), n)
@@ -0,0 +1,229 @@
+import argparse
+import base64
+import csv
+import dataclasses
+import datetime
+import enum
+import functools
+import io
+import json
+import os
+import pkgutil
+import sys
+from typing import Any, BinaryIO, Callable, Iterable, Literal, Sequence
+
+from johen.exc import GenerationError
+from johen.generators import base
+from johen.parallel import iter_parallel
+
+__all__ = ["main", "plain", "fieldnames", "write_jsonl", "write_msgpack", "write_csv", "formats"]
+
+
+def plain(value: Any) -> Any:
+    """
+    value as JSON compatible primitives: models become dicts, sets and tuples lists, dates and datetimes ISO
+    strings, timedeltas seconds, enums their value, and anything else (uuids, decimals, ...) its str.  Bytes are
+    left to each format to encode.
+    """
+    if isinstance(value, enum.Enum):
+        return plain(value.value)
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {f.name: plain(getattr(value, f.name)) for f in dataclasses.fields(value)}
+    if isinstance(value, tuple) and hasattr(value, "_asdict"):
+        return {k: plain(v) for k, v in value._asdict().items()}
+    if hasattr(value, "model_dump"):
+        return plain(value.model_dump())
+    if isinstance(value, dict):
+        return {_plain_key(k): plain(v) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        # Sorted, as the iteration order of strs and bytes changes with their hash seed, from process to process.
+        return sorted((plain(v) for v in value), key=repr)
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if hasattr(value, "tolist"):
+        # numpy arrays and scalars.
+        return plain(value.tolist())
+    return str(value)
+
+
+def _plain_key(key: Any) -> Any:
+    key = plain(key)
+    return key if key is None or isinstance(key, (str, int, float, bool)) else str(key)
+
+
+def _encode_bytes(value: Any) -> str:
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    raise TypeError(f"{type(value)} is not JSON serializable")
+
+
+def write_jsonl(records: Iterable[Any], out: BinaryIO):
+    for record in records:
+        line = json.dumps(plain(record), default=_encode_bytes, separators=(",", ":"))
+        out.write(line.encode() + b"\n")
+
+
+def _msgpack_ints(value: Any) -> Any:
+    # msgpack ints are 64 bits wide, larger ones are written as strs.
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if -(2**63) <= value < 2**64 else str(value)
+    if isinstance(value, dict):
+        return {_msgpack_ints(k): _msgpack_ints(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_msgpack_ints(v) for v in value]
+    return value
+
+
+def write_msgpack(records: Iterable[Any], out: BinaryIO):
+    try:
+        import msgpack
+    except ImportError:
+        raise ValueError("The msgpack format requires the msgpack package") from None
+
+    packer = msgpack.Packer()
+    for record in records:
+        value = plain(record)
+        try:
+            packed = packer.pack(value)
+        except OverflowError:
+            packed = packer.pack(_msgpack_ints(value))
+        out.write(packed)
+
+
+def fieldnames(model: Any) -> list[str] | None:
+    """
+    The fields of a dataclass, NamedTuple, TypedDict or pydantic model, in order, None for other models.
+    """
+    if dataclasses.is_dataclass(model) and isinstance(model, type):
+        return [f.name for f in dataclasses.fields(model)]
+    if isinstance(model, type) and issubclass(model, tuple) and hasattr(model, "_fields"):
+        return list(model._fields)
+    if base.is_typeddict(model):
+        return list(base.get_model_schema(model, base.typeddict_schema).annotations)
+    if isinstance(getattr(model, "model_fields", None), dict):
+        return list(model.model_fields)
+    return None
+
+
+def write_csv(records: Iterable[Any], out: BinaryIO, fieldnames: Sequence[str] | None = None):
+    """
+    Flat records only, with fieldnames as the header, or the keys of the first record.  Fields missing from a
+    record (such as the holes of `generate_defaults="holes"`) are left empty.
+    """
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    try:
+        writer: csv.DictWriter | None = None
+        for record in records:
+            row = plain(record)
+            if not isinstance(row, dict):
+                raise ValueError(f"The csv format requires records with fields, got {record!r}")
+            if writer is None:
+                writer = csv.DictWriter(text, fieldnames=list(fieldnames or row), restval="")
+                writer.writeheader()
+            for k, v in row.items():
+                if k not in writer.fieldnames:
+                    raise ValueError(
+                        f"The csv format requires the same fields in all records, got {k!r}"
+                    )
+                if isinstance(v, (dict, list)):
+                    raise ValueError(f"The csv format requires flat records, {k!r} is {v!r}")
+                if isinstance(v, bytes):
+                    row[k] = base64.b64encode(v).decode()
+            writer.writerow(row)
+    finally:
+        text.detach()
+
+
+formats: dict[str, Callable[[Iterable[Any], BinaryIO], None]] = {
+    "jsonl": write_jsonl,
+    "msgpack": write_msgpack,
+    "csv": write_csv,
+}
+
+_generate_defaults: dict[str | None, bool | Literal["holes"] | None] = {
+    "true": True,
+    "false": False,
+    "holes": "holes",
+    None: None,
+}
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="johen",
+        description="Streams generated examples of a model, in constant memory.",
+    )
+    parser.add_argument("target", help="The model to generate, as pkg.mod:Model")
+    parser.add_argument("-n", "--count", type=int, default=10, help="Number of examples")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-f", "--format", choices=list(formats), default="jsonl")
+    parser.add_argument("-o", "--output", default="-", help="Output file, stdout by default")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes; the output is the same for any number of workers",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=1000,
+        help="Examples per unit of work, bounding memory per worker",
+    )
+    parser.add_argument(
+        "--generate-defaults",
+        choices=["true", "false", "holes"],
+        default=None,
+        help="Whether to generate fields with defaults, or to leave random holes",
+    )
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.count < 1:
+        parser.error("count must be greater than 0")
+
+    # As with `python -m`, models are importable from the working directory.
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    try:
+        obj = pkgutil.resolve_name(args.target)
+    except (ImportError, AttributeError, ValueError) as e:
+        parser.error(f"could not import {args.target}: {e}")
+
+    generate_defaults = _generate_defaults[args.generate_defaults]
+    records = iter_parallel(
+        obj,
+        args.count,
+        workers=args.workers,
+        seed=args.seed,
+        generate_defaults=generate_defaults,
+        shard_size=args.shard_size,
+    )
+
+    write = formats[args.format]
+    if write is write_csv:
+        write = functools.partial(write_csv, fieldnames=fieldnames(obj))
+
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        write(records, out)
+        out.flush()
+    except (GenerationError, ValueError) as e:
+        parser.exit(1, f"{parser.prog}: error: {e}\n")
+    except BrokenPipeError:
+        # The reader went away (as with `| head`), silence the flush at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return 0
@@ -4,9 +4,9 @@ import uuid
 import zlib
 from typing import Any, Iterable, Iterator, Literal, Type
 
-from johen.generators import base, specialized
-from johen.generators.annotations import AnnotationMatcher
-from johen.random import gen
+from johen.generators import base, constraints, specialized
+from johen.generators.annotations import AnnotationMatcher, AnnotationProcessingContext
+from johen.random import PRNG, SeedStrategy, gen
 
 __all__ = [
     "ParametrizeConfig",
@@ -14,6 +14,7 @@ __all__ = [
     "updated_config",
     "compile_matchers",
     "pick_seed_from_name",
+    "TypeMatchers",
 ]
 
 try:
@@ -31,6 +32,12 @@ class ParametrizeConfig(TypedDict, total=False):
     # parameterize implementation, usually hashing the test function name.  This should be stable so that local and CI
     # test runs agree.
     seed: int | None
+    # How the seed of each example is derived from `seed`, see `johen.random.SeedStrategy`.  "indexed" makes each
+    # example depend only on the seed and its index, but yields different examples than the default "chained".
+    seed_strategy: SeedStrategy
+    # The random number generator examples are drawn from, see `johen.random.PRNG`.  "splitmix64" reseeds far
+    # cheaper, which dominates the cost of many small examples, but also yields different examples.
+    prng: PRNG
     # Configures the number of parametrized examples that should be generated.
     count: int
     # See `AnnotationProcessingContext.generate_defaults`
@@ -47,6 +54,18 @@ class ParametrizeConfig(TypedDict, total=False):
     # Increasing this can hide bugs and performance issues.  Decreasing this can lead to fragile generation and
     # unexpected failures.
     max_iterations: int
+    # Wall clock budgets, in seconds, for generating each example and all the examples of a test.  When exceeded,
+    # the next draw from `gen` raises a `GenerationTimeout` naming the path being generated.  A single draw (or a
+    # user factory called between draws) cannot be interrupted, so these bound how long generation can *continue*.
+    max_example_seconds: float | None
+    max_test_seconds: float | None
+    # The maximum number of nodes (collections and their items) in a value of a recursive type, such as JsonValue.
+    # Each collection within it is one node and splits the remaining size evenly among its items, so the time and
+    # memory of generating such values is bounded.  Non recursive types are unaffected.
+    size: int
+    # Relative weights of union members by annotation, defaulting to 1, e.g. {None: 0.1} to rarely pick None from
+    # `X | None`.  Members are only built once first picked, so a weight of 0 also avoids building a member at all.
+    union_weights: dict[Any, float]
     type_matchers: dict[Any, Iterator]
     matchers: list[AnnotationMatcher]
     globals: dict[str, Any]
@@ -56,20 +75,56 @@ def pick_seed_from_name(name: str) -> int:
     return zlib.crc32(name.encode("utf8")) & 0xFFFFFFFF
 
 
+class TypeMatchers:
+    """
+    Matches sources exactly against a snapshot of the `type_matchers` config.  Snapshots with the same entries
+    compare equal, so that generation plans are shared between compilations of an unchanged config, and are
+    invalidated when it changes.
+    """
+
+    def __init__(self, type_matchers: dict[Any, Iterator]):
+        self.type_matchers = dict(type_matchers)
+        self._hash = hash(tuple((k, id(v)) for k, v in self.type_matchers.items()))
+
+    def __call__(self, context: AnnotationProcessingContext) -> Iterator | None:
+        try:
+            return self.type_matchers.get(context.source, None)
+        except TypeError:
+            return None
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, TypeMatchers):
+            return NotImplemented
+        return (
+            self._hash == other._hash
+            and self.type_matchers.keys() == other.type_matchers.keys()
+            and all(v is other.type_matchers[k] for k, v in self.type_matchers.items())
+        )
+
+    def __hash__(self) -> int:
+        return self._hash
+
+
 def compile_matchers(config: ParametrizeConfig) -> list[AnnotationMatcher]:
     return [
         *config["matchers"],
-        lambda context: config["type_matchers"].get(context.source, None),
+        TypeMatchers(config["type_matchers"]),
     ]
 
 
 def get_base_config() -> ParametrizeConfig:
     return {
         "seed": None,
+        "seed_strategy": "chained",
+        "prng": "mersenne",
         "generate_defaults": False,
         "arg_set": None,
         "overrides": {},
         "max_iterations": 10000,
+        "max_example_seconds": None,
+        "max_test_seconds": None,
+        "size": 30,
+        "union_weights": {},
         "count": 10,
         "type_matchers": {
             int: specialized.ints,
@@ -85,7 +140,7 @@ def get_base_config() -> ParametrizeConfig:
             None: specialized.nones,
             type(None): specialized.nones,
             Any: specialized.json_primitives,
-            random.Random: (r for r in gen),
+            random.Random: gen,
         },
         "matchers": [
             base.generate_dicts_from_typeddict,
@@ -96,6 +151,7 @@ def get_base_config() -> ParametrizeConfig:
             base.generate_literals,
             base.generate_dicts,
             base.generate_unions,
+            constraints.generate_constrained,
             base.generate_annotated,
             base.generate_enums,
             base.generate_tuples,
@@ -110,6 +166,10 @@ def updated_config(left: ParametrizeConfig, right: ParametrizeConfig) -> Paramet
 
     return {
         "seed": right.get("seed", left.get("seed")),
+        "seed_strategy": right.get(
+            "seed_strategy", left.get("seed_strategy", default["seed_strategy"])
+        ),
+        "prng": right.get("prng", left.get("prng", default["prng"])),
         "count": right.get("count", left.get("count", default["count"])),
         "generate_defaults": right.get(
             "generate_defaults", left.get("generate_defaults", default["generate_defaults"])
@@ -119,6 +179,14 @@ def updated_config(left: ParametrizeConfig, right: ParametrizeConfig) -> Paramet
         "max_iterations": right.get(
             "max_iterations", left.get("max_iterations", default["max_iterations"])
         ),
+        "max_example_seconds": right.get(
+            "max_example_seconds", left.get("max_example_seconds", default["max_example_seconds"])
+        ),
+        "max_test_seconds": right.get(
+            "max_test_seconds", left.get("max_test_seconds", default["max_test_seconds"])
+        ),
+        "size": right.get("size", left.get("size", default["size"])),
+        "union_weights": {**left.get("union_weights", {}), **right.get("union_weights", {})},
         "type_matchers": {**left.get("type_matchers", {}), **right.get("type_matchers", {})},
         "matchers": [*right.get("matchers", []), *left.get("matchers", [])],
         "globals": {**left.get("globals", {}), **right.get("globals", {})},
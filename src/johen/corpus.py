@@ -0,0 +1,207 @@
+import dataclasses
+import hashlib
+import importlib.metadata
+import inspect
+import os
+import pathlib
+import pickle
+import re
+import tempfile
+import types
+import typing
+import uuid
+import warnings
+from typing import Any
+
+__all__ = ["CorpusCache", "fingerprint"]
+
+_address = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+def _johen_version() -> str:
+    try:
+        return importlib.metadata.version("johen")
+    except importlib.metadata.PackageNotFoundError:
+        return "dev"
+
+
+class _Undescribable(Exception):
+    pass
+
+
+def _describe(obj: Any, seen: set[int]) -> str:
+    if isinstance(obj, (str, bytes, int, float, complex, bool, type(None))):
+        return repr(obj)
+    if isinstance(obj, (list, tuple)):
+        return f"({', '.join(_describe(v, seen) for v in obj)})"
+    if isinstance(obj, dict):
+        return f"{{{', '.join(f'{_describe(k, seen)}: {_describe(v, seen)}' for k, v in obj.items())}}}"
+    if isinstance(obj, (set, frozenset)):
+        return f"{{{', '.join(sorted(_describe(v, seen) for v in obj))}}}"
+    if isinstance(obj, types.ModuleType):
+        return obj.__name__
+    if isinstance(obj, types.CodeType):
+        return _describe_code(obj, seen)
+
+    origin = typing.get_origin(obj)
+    if origin is not None:
+        args = ", ".join(_describe(a, seen) for a in typing.get_args(obj))
+        return f"{_describe(origin, seen)}[{args}]"
+    if type(obj).__module__ in ("typing", "typing_extensions"):
+        # Any, TypeVars, ForwardRefs and other special forms.
+        return _address.sub("", repr(obj))
+
+    name = getattr(obj, "__qualname__", None)
+    if name is None or not (inspect.isclass(obj) or callable(obj)):
+        return _describe_instance(obj, seen)
+
+    name = f"{getattr(obj, '__module__', '')}.{name}"
+    if id(obj) in seen:
+        return name
+    seen.add(id(obj))
+
+    parts: list[str] = []
+    if inspect.isclass(obj):
+        for base in reversed(obj.__mro__):
+            annotations = base.__dict__.get("__annotations__")
+            if isinstance(annotations, dict):
+                parts.extend(f"{k}: {_describe(v, seen)}" for k, v in annotations.items())
+        if members := getattr(obj, "__members__", None):
+            parts.append(_describe({k: getattr(v, "value", v) for k, v in members.items()}, seen))
+    else:
+        code = getattr(obj, "__code__", None)
+        if code is not None:
+            parts.append(_describe_code(code, seen))
+            parts.append(_describe(getattr(obj, "__defaults__", None), seen))
+            parts.append(_describe(getattr(obj, "__kwdefaults__", None), seen))
+            # The values a lambda closes over (such as the options of `gen.one_of`) are part of its behavior.
+            for cell in getattr(obj, "__closure__", None) or ():
+                try:
+                    parts.append(_describe(cell.cell_contents, seen))
+                except ValueError:
+                    parts.append("<empty>")
+        bound = getattr(obj, "__self__", None)
+        if bound is not None and not isinstance(bound, types.ModuleType):
+            # Bound methods, such as `"-".join`.
+            parts.append(_describe(bound, seen))
+        parts.extend(
+            f"{k}: {_describe(v, seen)}" for k, v in getattr(obj, "__annotations__", {}).items()
+        )
+    return f"{name}{{{', '.join(parts)}}}"
+
+
+def _describe_code(code: types.CodeType, seen: set[int]) -> str:
+    digest = hashlib.sha256(code.co_code).hexdigest()[:16]
+    return f"{digest}{_describe(code.co_consts, seen)}{_describe(code.co_names, seen)}"
+
+
+def _describe_instance(obj: Any, seen: set[int]) -> str:
+    """
+    Iterators and other instances, by their type and what they are reconstructed from when pickled: the
+    function and source of a `map`, or the fields of a dataclass.  Generators are described by their code and
+    closure.
+    """
+    name = f"{type(obj).__module__}.{type(obj).__qualname__}"
+    if id(obj) in seen:
+        return name
+    seen.add(id(obj))
+
+    if inspect.isgenerator(obj):
+        # Only the variables the generator closes over, as its other locals (the Randoms and values drawn so
+        # far) change as it is advanced.
+        code, frame = obj.gi_code, obj.gi_frame
+        closure = {k: frame.f_locals.get(k) for k in code.co_freevars} if frame is not None else {}
+        return f"{name}{{{_describe_code(code, seen)}, {_describe(closure, seen)}}}"
+    try:
+        with warnings.catch_warnings():
+            # Pickling itertools is deprecated, and unsupported from Python 3.14.
+            warnings.simplefilter("ignore", DeprecationWarning)
+            reduced = obj.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        raise _Undescribable(name) from e
+    if isinstance(reduced, str):
+        # A module level singleton.
+        return f"{name}:{reduced}"
+    return f"{name}{_describe(tuple(reduced[:3]), seen)}"
+
+
+def fingerprint(*parts: Any) -> str | None:
+    """
+    A stable digest of annotations and matchers, including the annotations of the classes they reference and the
+    code and closures of functions and iterators, for keying generated examples across processes.  Objects are
+    described by their qualified names and structure, never by their ids.  None when some part cannot be
+    described, in which case its examples should not be cached.
+    """
+    try:
+        description = _describe((_johen_version(), *parts), set())
+    except (_Undescribable, RecursionError):
+        return None
+    return hashlib.sha256(description.encode("utf8")).hexdigest()
+
+
+@dataclasses.dataclass
+class CorpusCache:
+    """
+    Stores pickled examples on disk, each file mapping example index to its pickle.  Each cache instance (such as
+    each xdist worker) writes its own file per key, replaced atomically, and load merges the files of all writers,
+    so that concurrent sessions never overwrite each other's examples.  The least recently used files are evicted
+    once the directory exceeds max_bytes.
+    """
+
+    directory: pathlib.Path
+    max_bytes: int = 64 * 1024 * 1024
+    writer: str = dataclasses.field(default_factory=lambda: uuid.uuid4().hex[:16])
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.directory / f"{key}.{self.writer}.pickle"
+
+    def load(self, key: str) -> dict[int, bytes]:
+        corpus: dict[int, bytes] = {}
+        for path in sorted(self.directory.glob(f"{key}.*.pickle")):
+            corpus.update(self._load_file(path))
+        return corpus
+
+    def _load_file(self, path: pathlib.Path) -> dict[int, bytes]:
+        try:
+            with open(path, "rb") as f:
+                corpus = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return {}
+        return corpus if isinstance(corpus, dict) else {}
+
+    def store(self, key: str, examples: dict[int, bytes]):
+        if not examples:
+            return
+        # Only this writer replaces its file, merging with what it stored before.
+        corpus = {**self._load_file(self._path(key)), **examples}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(corpus, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        entries: list[tuple[float, int, pathlib.Path]] = []
+        for path in self.directory.glob("*.pickle"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for path in self.directory.glob("*.pickle"):
+            path.unlink(missing_ok=True)
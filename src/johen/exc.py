@@ -1,2 +1,12 @@
 class GenerationError(Exception):
     pass
+
+
+class GenerationTimeout(GenerationError):
+    """
+    Raised from `gen` when the time budget of the current example, see `max_example_seconds`, has run out.
+    """
+
+    def __init__(self, message: str, path: tuple[str, ...] = ()):
+        super().__init__(message)
+        self.path = path
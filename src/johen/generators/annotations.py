@@ -1,19 +1,221 @@
+import collections
 import dataclasses
 import inspect
+import types
 import typing
 from typing import Any, Iterator
 
-from johen.exc import GenerationError
+from johen.exc import GenerationError, GenerationTimeout
+from johen.profiler import profiler
 from johen.random import gen
 
 _A = typing.TypeVar("_A")
+_M = typing.TypeVar("_M", bound=typing.Callable)
 
 
 class AnnotationMatcher(typing.Protocol):
+    """
+    Produces an iterator for the given context, or None when the annotation is not handled.
+    Whether a matcher applies should only depend on the context's source, origin, and args, as that decision is
+    cached in the generation plan for the annotation.
+    """
+
     def __call__(self, context: "AnnotationProcessingContext") -> Iterator[Any] | None:
         ...
 
 
+@dataclasses.dataclass(eq=False)
+class GenerationPlan:
+    """
+    The matcher resolved for an annotation, and the plans of the annotations its iterators step into, by step.
+    """
+
+    matcher: AnnotationMatcher
+    # Keyed by step, and the stepped source and args, compared by equality as the keys of `GenerationPlans` are, so
+    # that args built afresh on each step share one entry.  Unhashable annotations are not recorded.
+    children: "dict[tuple[str | None, Any, Any], GenerationPlan]" = dataclasses.field(
+        default_factory=dict
+    )
+
+    def child(self, step: str | None, source: Any, args: Any) -> "GenerationPlan | None":
+        try:
+            return self.children.get((step, source, args))
+        except TypeError:
+            return None
+
+    def record_child(self, step: str | None, source: Any, args: Any, plan: "GenerationPlan"):
+        try:
+            self.children[(step, source, args)] = plan
+        except TypeError:
+            pass
+
+
+@dataclasses.dataclass
+class GenerationPlans:
+    """
+    An LRU cache of the plan resolved for an annotation, keyed on the annotation's identity and the compiled
+    matchers.  Generating an annotation seen before only invokes the matcher that handled it the first time, and
+    the annotations it steps into reuse the sub-plans recorded under it, instead of rescanning the matchers list;
+    the iterators themselves are always freshly constructed.
+    """
+
+    maxsize: int = 4096
+    entries: "collections.OrderedDict[Any, GenerationPlan]" = dataclasses.field(
+        default_factory=collections.OrderedDict
+    )
+    hits: int = 0
+    misses: int = 0
+
+    def get(self, key: Any) -> GenerationPlan | None:
+        try:
+            plan = self.entries[key]
+            # Another thread may evict the entry in between, which is simply a miss.
+            self.entries.move_to_end(key)
+        except (KeyError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return plan
+
+    def put(self, key: Any, plan: GenerationPlan):
+        try:
+            self.entries[key] = plan
+        except TypeError:
+            # Unhashable annotation, it simply does not get a plan.
+            return
+        evict_lru(self.entries, self.maxsize)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def evict_lru(entries: collections.OrderedDict, maxsize: int):
+    """
+    Evicts the least recently used entries beyond maxsize.  The LRUs here are shared by concurrently generating
+    threads without a lock, so another thread may have emptied them in the meantime.
+    """
+    while len(entries) > maxsize:
+        try:
+            entries.popitem(last=False)
+        except KeyError:
+            return
+
+
+generation_plans = GenerationPlans()
+
+
+@dataclasses.dataclass(frozen=True)
+class DispatchKeys:
+    # Origins, types or instances' types that are matched exactly, or via the MRO of a class being dispatched.
+    keys: tuple[Any, ...] = ()
+    # Matches any class that the given types are a subclass of, see `concretely_implemented_by`.
+    implemented_by: tuple[type, ...] = ()
+
+
+def dispatch_on(*keys: Any, implemented_by: tuple[type, ...] = ()) -> typing.Callable[[_M], _M]:
+    """
+    Declares the only dispatch keys for which a matcher could possibly return a result, allowing `MatcherRegistry`
+    to skip it for all other annotations.  Matchers without this declaration are tried for every annotation.
+    """
+
+    def decorator(matcher: _M) -> _M:
+        matcher.dispatch_keys = DispatchKeys(keys=keys, implemented_by=implemented_by)  # type: ignore
+        return matcher
+
+    return decorator
+
+
+@dataclasses.dataclass(eq=False)
+class MatcherRegistry:
+    """
+    Indexes a list of matchers by their `dispatch_on` keys.  The dispatch key of an annotation is its origin, or
+    otherwise the source itself; classes are also looked up by their MRO, other values by their type's MRO.
+    Candidate matchers are resolved once per dispatch key, and always retain their order from the matchers list.
+    """
+
+    matchers: tuple[AnnotationMatcher, ...]
+    by_key: dict[Any, list[int]] = dataclasses.field(default_factory=dict)
+    implemented_by: list[tuple[int, tuple[type, ...]]] = dataclasses.field(default_factory=list)
+    catch_all: list[int] = dataclasses.field(default_factory=list)
+    _candidates: dict[Any, tuple[AnnotationMatcher, ...]] = dataclasses.field(default_factory=dict)
+
+    def __post_init__(self):
+        for i, matcher in enumerate(self.matchers):
+            dispatch_keys: DispatchKeys | None = getattr(matcher, "dispatch_keys", None)
+            if dispatch_keys is None:
+                self.catch_all.append(i)
+                continue
+            for key in dispatch_keys.keys:
+                self.by_key.setdefault(key, []).append(i)
+            if dispatch_keys.implemented_by:
+                self.implemented_by.append((i, dispatch_keys.implemented_by))
+
+    def candidates(self, context: "AnnotationProcessingContext") -> tuple[AnnotationMatcher, ...]:
+        key = context.origin if context.origin is not None else context.source
+        try:
+            return self._candidates[key]
+        except KeyError:
+            result = self._candidates[key] = self._resolve(key)
+            return result
+        except TypeError:
+            return self._resolve(key)
+
+    def _resolve(self, key: Any) -> tuple[AnnotationMatcher, ...]:
+        indexes = set(self.catch_all)
+        if inspect.isclass(key):
+            lookups: typing.Iterable[Any] = key.__mro__
+            for i, implemented_by in self.implemented_by:
+                try:
+                    if any(issubclass(t, key) for t in implemented_by):
+                        indexes.add(i)
+                except TypeError:
+                    continue
+        else:
+            lookups = (key, *type(key).__mro__)
+
+        for lookup in lookups:
+            try:
+                indexes.update(self.by_key.get(lookup, ()))
+            except TypeError:
+                continue
+        return tuple(self.matchers[i] for i in sorted(indexes))
+
+
+@dataclasses.dataclass
+class MatcherRegistries:
+    """
+    An LRU of registries for each distinct compiled matchers list.  Equal lists share a registry, which makes the
+    registry itself usable as the matchers' fingerprint in generation plans.
+    """
+
+    maxsize: int = 64
+    entries: "collections.OrderedDict[tuple[AnnotationMatcher, ...], MatcherRegistry]" = (
+        dataclasses.field(default_factory=collections.OrderedDict)
+    )
+
+    def for_matchers(self, matchers: typing.Sequence[AnnotationMatcher]) -> MatcherRegistry:
+        key = tuple(matchers)
+        try:
+            registry = self.entries[key]
+            self.entries.move_to_end(key)
+        except (KeyError, TypeError):
+            registry = MatcherRegistry(key)
+            try:
+                self.entries[key] = registry
+            except TypeError:
+                return registry
+            evict_lru(self.entries, self.maxsize)
+        return registry
+
+    def clear(self):
+        self.entries.clear()
+
+
+matcher_registries = MatcherRegistries()
+
+
 @dataclasses.dataclass
 class AnnotationProcessingContext:
     source: Any
@@ -24,6 +226,22 @@ class AnnotationProcessingContext:
     matchers: list[AnnotationMatcher] = dataclasses.field(default_factory=list)
     globals: dict[str, Any] = dataclasses.field(default_factory=dict)
     recursive_depth: int = 0
+    # The maximum number of nodes of a value of a recursive type, see `ParametrizeConfig.size`.
+    size: int = 30
+    # Relative weights of union members, see `ParametrizeConfig.union_weights`.
+    union_weights: dict[Any, float] = dataclasses.field(default_factory=dict)
+    # The matchers this registry was compiled from, and the registry itself.  Shared by stepped contexts.
+    _registry: tuple[list[AnnotationMatcher], MatcherRegistry] | None = dataclasses.field(
+        default=None, repr=False, compare=False
+    )
+    # This context's resolved plan, and the plan it was stepped from, along with the step, source and args to
+    # record this context's plan under.
+    _plan: GenerationPlan | None = dataclasses.field(default=None, repr=False, compare=False)
+    _parent_plan: tuple[GenerationPlan, str | None, Any, Any] | None = dataclasses.field(
+        default=None, repr=False, compare=False
+    )
+    # Set while resolving a plan without generating, see `plan`.
+    _planning: bool = dataclasses.field(default=False, repr=False, compare=False)
 
     def concretely_implements(self, other: Any) -> bool:
         for origin in (self.origin, self.source):
@@ -37,6 +255,9 @@ class AnnotationProcessingContext:
             try:
                 for i in iterator:
                     yield i
+            except GenerationTimeout:
+                # Already names the innermost path being generated.
+                raise
             except Exception as e:
                 raise GenerationError(
                     f"Generation failed unexpectedly for {' '.join(self.path)} {self.source}"
@@ -61,18 +282,46 @@ class AnnotationProcessingContext:
         args: tuple[Any, ...] | None = None,
         recursive=False,
     ) -> Iterator:
-        next_context = AnnotationProcessingContext.from_source(source)
+        if self._planning:
+            # Resolving this context's plan only, its children are resolved when they are generated.
+            return iter(())
+        return self.child(source, step, args, recursive).generate()
+
+    def child(
+        self,
+        source: Any,
+        step: str | None = None,
+        args: tuple[Any, ...] | None = None,
+        recursive=False,
+    ) -> "AnnotationProcessingContext":
+        """
+        The context `step` generates from, for matchers that inspect an annotation before generating it.
+        """
+        # Built directly rather than through `from_source`, whose root path would be replaced anyway, and whose
+        # repr of the source is costly for large (recursive) unions.
+        next_context = AnnotationProcessingContext(
+            source=source,
+            origin=typing.get_origin(source),
+            args=typing.get_args(source) or (),
+            path=(*self.path, step) if step else self.path,
+        )
         if args is not None:
             next_context.origin = source
             next_context.args = args
-        next_context.path = (*self.path, step) if step else self.path
         next_context.generate_defaults = self.generate_defaults
         next_context.matchers = self.matchers
+        next_context._registry = self._registry
         next_context.globals = self.globals
+        next_context.size = self.size
+        next_context.union_weights = self.union_weights
+        next_context._planning = self._planning
         if recursive:
             next_context.recursive_depth = self.recursive_depth + 1
-
-        return next_context.generate()
+        if self._plan is not None:
+            next_context._plan = self._plan.child(step, source, args)
+            if next_context._plan is None:
+                next_context._parent_plan = (self._plan, step, source, args)
+        return next_context
 
     @classmethod
     def from_source(cls, source: Any) -> "AnnotationProcessingContext":
@@ -83,11 +332,73 @@ class AnnotationProcessingContext:
             path=(repr(source),),
         )
 
+    @property
+    def registry(self) -> MatcherRegistry:
+        if self._registry is None or self._registry[0] is not self.matchers:
+            self._registry = (self.matchers, matcher_registries.for_matchers(self.matchers))
+        return self._registry[1]
+
+    @property
+    def plan_key(self) -> tuple[Any, ...]:
+        return (self.source, self.origin, self.args, self.registry)
+
     def generate(
         self,
     ) -> typing.Iterator:
-        for matcher in self.matchers:
+        result = self._generate()
+        if isinstance(result, types.GeneratorType):
+            # Generators advance the iterators of other contexts, record which for `GenerationTimeout`s.  Leaf
+            # iterators (such as maps of `gen`) are reported at the path of their parent.
+            result = gen.at_path(self.path, result)
+        target = profiler.target()
+        if target is not None:
+            return profiler.wrap(self.path, result, target)
+        return result
+
+    def plan(self) -> AnnotationMatcher | None:
+        """
+        The matcher that generates this context's annotation, resolving (and recording) it first if necessary.
+        Resolution only invokes the matchers for this annotation, whose children are not generated.  None for
+        annotations that cannot have a plan, such as unhashable ones.
+        """
+        if self._plan is None:
+            self._lookup_plan()
+        if self._plan is None:
+            self._planning = True
+            try:
+                self._resolve()
+            finally:
+                self._planning = False
+        return self._plan.matcher if self._plan is not None else None
+
+    def _lookup_plan(self):
+        self._plan = generation_plans.get(self.plan_key)
+        if self._plan is not None:
+            self._record_plan()
+
+    def _record_plan(self):
+        if self._parent_plan is not None and self._plan is not None:
+            parent, step, source, args = self._parent_plan
+            parent.record_child(step, source, args, self._plan)
+            self._parent_plan = None
+
+    def _generate(self) -> typing.Iterator:
+        if self._plan is None:
+            self._lookup_plan()
+        if self._plan is not None:
+            result = self._plan.matcher(self)
+            if result is not None:
+                return result
+        return self._resolve()
+
+    def _resolve(self) -> typing.Iterator:
+        for matcher in self.registry.candidates(self):
+            # Children stepped into by the candidate record their plans under it.
+            self._plan = GenerationPlan(matcher)
             result = matcher(self)
             if result is not None:
+                generation_plans.put(self.plan_key, self._plan)
+                self._record_plan()
                 return result
+        self._plan = None
         raise GenerationError(f"Could not generate for {' '.join(self.path)} {self.source}")
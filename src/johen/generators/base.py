@@ -1,16 +1,20 @@
+import collections
+import contextlib
 import dataclasses
 import enum
 import inspect
 import itertools
+import random
 import types
 import typing
+import weakref
 from typing import Any, Iterator, get_type_hints
 
 from johen.examples import Examples
 from johen.exc import GenerationError
-from johen.generators.annotations import AnnotationProcessingContext
+from johen.generators.annotations import AnnotationProcessingContext, dispatch_on, evict_lru
 from johen.generators.specialized import SimpleSymbol, ints
-from johen.random import gen
+from johen.random import AliasTable, gen
 
 __all__ = [
     "generate_dicts",
@@ -28,9 +32,62 @@ __all__ = [
     "generate_results_from_call",
     "generate_dicts_from_typeddict",
     "generate_named_tuples",
+    "ModelSchema",
+    "get_model_schema",
+    "invalidate_model_schema",
+    "resolve_forward_ref",
+    "dataclass_schema",
+    "named_tuple_schema",
+    "typeddict_schema",
+    "is_typeddict",
+    "is_recursive",
+    "union_table",
 ]
 
 
+class ModelSchema(typing.NamedTuple):
+    # Resolved annotations of each field, in field order.
+    annotations: dict[str, Any]
+    # Fields that can be omitted, see `AnnotationProcessingContext.generate_defaults`.
+    optional_keys: list[str]
+
+
+_SchemaResolver = typing.Callable[[Any], ModelSchema]
+_model_schemas: "weakref.WeakKeyDictionary[Any, dict[_SchemaResolver, ModelSchema]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_model_schema(source: Any, resolve: _SchemaResolver) -> ModelSchema:
+    """
+    Resolves the schema of a model class once per `resolve` strategy, as `get_type_hints` and friends are
+    expensive, and models tend to appear many times while generating.  Classes are weakly referenced.
+    """
+    try:
+        schemas = _model_schemas[source]
+    except KeyError:
+        schemas = _model_schemas[source] = {}
+    except TypeError:
+        return resolve(source)
+
+    try:
+        return schemas[resolve]
+    except KeyError:
+        schema = schemas[resolve] = resolve(source)
+        return schema
+
+
+def invalidate_model_schema(source: Any | None = None):
+    """
+    Drops cached schemas for the given class, or for every class when None.  Necessary when a class's annotations
+    or fields are mutated at runtime after it was first generated.
+    """
+    if source is None:
+        _model_schemas.clear()
+    else:
+        _model_schemas.pop(source, None)
+
+
 def generate_dicts_for_annotations(
     annotations: typing.Mapping[str, int],
     context: "AnnotationProcessingContext",
@@ -69,11 +126,15 @@ def generate_dicts_for_annotations(
 def generate_dicts_for_dataclass_model(
     context: "AnnotationProcessingContext",
 ) -> Iterator[dict[str, Any]]:
-    hints = get_type_hints(context.source, include_extras=True)
-    fields = {f.name: f for f in dataclasses.fields(context.source)}
-    return generate_dicts_for_annotations(
-        {k: hints.get(k, Any) for k, field in fields.items()},
-        context,
+    schema = get_model_schema(context.source, dataclass_schema)
+    return generate_dicts_for_annotations(schema.annotations, context, schema.optional_keys)
+
+
+def dataclass_schema(source: Any) -> ModelSchema:
+    hints = get_type_hints(source, include_extras=True)
+    fields = {f.name: f for f in dataclasses.fields(source)}
+    return ModelSchema(
+        annotations={k: hints.get(k, Any) for k, field in fields.items()},
         optional_keys=[k for k, field in fields.items() if _dataclass_has_default(field)],
     )
 
@@ -158,12 +219,14 @@ def generate_call_args_for_argspec(
     return zip(arg_generator, kwargs_generator)
 
 
+@dispatch_on(enum.Enum)
 def generate_enums(context: "AnnotationProcessingContext") -> Iterator[Any] | None:
     if context.concretely_implements(enum.Enum) or context.concretely_implements(enum.IntEnum):
         return gen.one_of(context.source)
     return None
 
 
+@dispatch_on(typing.Literal)
 def generate_literals(context: "AnnotationProcessingContext") -> Iterator[Any] | None:
     if context.origin is typing.Literal:
         return gen.one_of(context.args)
@@ -176,39 +239,56 @@ def generate_dataclass_instances(context: AnnotationProcessingContext) -> Iterat
     return None
 
 
-def generate_dicts_from_typeddict(context: AnnotationProcessingContext) -> Iterator[Any] | None:
-    is_match = typing.is_typeddict(context.source)
-    if not is_match:
-        try:
-            import typing_extensions
+def is_typeddict(source: Any) -> bool:
+    if typing.is_typeddict(source):
+        return True
+    try:
+        import typing_extensions
 
-            is_match = typing_extensions.is_typeddict(context.source)
-        except ImportError:
-            pass
+        return typing_extensions.is_typeddict(source)
+    except ImportError:
+        return False
 
-    if is_match:
-        optional: list[str] = sorted(getattr(context.source, "__optional_keys__", frozenset()))
-        hints = get_type_hints(context.source, include_extras=True)
-        return generate_dicts_for_annotations(
-            {k: v for k, v in hints.items()}, context, optional_keys=list(optional)
-        )
+
+@dispatch_on(dict)
+def generate_dicts_from_typeddict(context: AnnotationProcessingContext) -> Iterator[Any] | None:
+    if is_typeddict(context.source):
+        schema = get_model_schema(context.source, typeddict_schema)
+        return generate_dicts_for_annotations(schema.annotations, context, schema.optional_keys)
 
     return None
 
 
+def typeddict_schema(source: Any) -> ModelSchema:
+    optional: list[str] = sorted(getattr(source, "__optional_keys__", frozenset()))
+    hints = get_type_hints(source, include_extras=True)
+    return ModelSchema(annotations={k: v for k, v in hints.items()}, optional_keys=list(optional))
+
+
+@dispatch_on(implemented_by=(dict,))
 def generate_dicts(context: AnnotationProcessingContext) -> Iterator[dict[Any, Any]] | None:
     if context.concretely_implemented_by(dict):
         key, value, *_ = (*context.args, str, str)
         key_generator = context.step(key, "[Key]")
         value_generator = context.step(value, "[Value]")
-        return context.wrap_with_debug_context(
-            dict((k, v) for k, v, _ in zip(key_generator, value_generator, range(length)))
-            for length in (r.randint(0, 5 - context.recursive_depth) for r in gen)
-        )
+        if not is_recursive(value):
+            return context.wrap_with_debug_context(
+                dict((k, v) for k, v, _ in zip(key_generator, value_generator, range(length)))
+                for length in (r.randint(0, 5 - context.recursive_depth) for r in gen)
+            )
+
+        def sized_dicts():
+            for r in gen:
+                with _sized_children(r, context) as length:
+                    items = list(zip(range(length), key_generator, value_generator))
+                yield dict((k, v) for _, k, v in items)
+
+        return context.wrap_with_debug_context(sized_dicts())
 
     return None
 
 
+@dispatch_on(types.FunctionType)
 def generate_results_from_call(context: AnnotationProcessingContext) -> Iterator[Any] | None:
     if inspect.isfunction(context.source):
         argspec = inspect.getfullargspec(context.source)
@@ -220,18 +300,25 @@ def generate_results_from_call(context: AnnotationProcessingContext) -> Iterator
     return None
 
 
+@dispatch_on(tuple)
 def generate_named_tuples(context: AnnotationProcessingContext) -> Iterator[Any] | None:
     if context.concretely_implements(tuple) and hasattr(context.source, "_field_defaults"):
-        keys: tuple[str, ...] = context.source._fields  # noqa
-        defaults: dict[str, Any] = context.source._field_defaults
-        hints = get_type_hints(context.source, include_extras=True)
-        dicts = generate_dicts_for_annotations(
-            {k: hints.get(k, Any) for k in keys}, context, optional_keys=list(defaults.keys())
-        )
+        schema = get_model_schema(context.source, named_tuple_schema)
+        dicts = generate_dicts_for_annotations(schema.annotations, context, schema.optional_keys)
         return (context.source(**d) for d in dicts)
     return None
 
 
+def named_tuple_schema(source: Any) -> ModelSchema:
+    keys: tuple[str, ...] = source._fields  # noqa
+    defaults: dict[str, Any] = source._field_defaults
+    hints = get_type_hints(source, include_extras=True)
+    return ModelSchema(
+        annotations={k: hints.get(k, Any) for k in keys}, optional_keys=list(defaults.keys())
+    )
+
+
+@dispatch_on(implemented_by=(tuple,))
 def generate_tuples(context: AnnotationProcessingContext) -> Iterator[Any] | None:
     if context.concretely_implemented_by(tuple):
         has_ellipsis = not context.args or Ellipsis in context.args
@@ -256,23 +343,82 @@ def generate_tuples(context: AnnotationProcessingContext) -> Iterator[Any] | Non
     return None
 
 
+@dispatch_on(typing.Union, types.UnionType)
 def generate_unions(context: AnnotationProcessingContext) -> Iterator[Any] | None:
     if context.origin in (typing.Union, types.UnionType) and context.args:
-        return gen.one_of(*(context.step(arg, f"|") for arg in context.args))
+        return _lazy_unions(context)
     return None
 
 
+def _union_weight(weights: dict[Any, float], arg: Any) -> float:
+    # Also accepts None for NoneType, and the name of a forward ref.
+    try:
+        if arg in weights:
+            return weights[arg]
+    except TypeError:
+        return 1
+    if arg is type(None):
+        return weights.get(None, 1)
+    if isinstance(arg, _forward_ref_types):
+        return weights.get(typing.cast(typing.ForwardRef, arg).__forward_arg__, 1)
+    return 1
+
+
+def union_table(context: AnnotationProcessingContext) -> AliasTable | None:
+    """
+    The table picking members of the union in context by their `union_weights`, None when unweighted.
+    """
+    if not context.union_weights:
+        return None
+    try:
+        return AliasTable.from_weights(
+            [_union_weight(context.union_weights, arg) for arg in context.args]
+        )
+    except ValueError as e:
+        raise GenerationError(
+            f"Invalid union weights for {' '.join(context.path)} {context.source}"
+        ) from e
+
+
+def _lazy_unions(context: AnnotationProcessingContext) -> Iterator[Any]:
+    """
+    Picks a member of the union for each value, only building the generator of a member the first time it is
+    picked.  Without weights the draws are those of `gen.one_of`.
+    """
+    args = context.args
+    branches: list[Iterator[Any] | None] = [None] * len(args)
+    table = union_table(context)
+
+    for r in gen:
+        i = r.randrange(len(args)) if table is None else table.pick(r)
+        branch = branches[i]
+        if branch is None:
+            branch = branches[i] = context.step(args[i], "|")
+        value = next(branch, _exhausted)
+        if value is _exhausted:
+            return
+        yield value
+
+
+@dispatch_on(implemented_by=(list, set, frozenset))
 def generate_lists_sets_frozen_sets(context: AnnotationProcessingContext) -> Iterator[Any] | None:
     for constructor in (list, set, frozenset):
         if context.concretely_implemented_by(constructor):
             arg = next(iter(context.args), Any)
             generator = context.step(arg)
-            return (
-                constructor(
-                    [i for i, _ in zip(generator, range(r.randint(0, 5 - context.recursive_depth)))]
+            if not is_recursive(arg):
+                return (
+                    constructor(
+                        [
+                            i
+                            for i, _ in zip(
+                                generator, range(r.randint(0, 5 - context.recursive_depth))
+                            )
+                        ]
+                    )
+                    for r in gen
                 )
-                for r in gen
-            )
+            return _sized_collections(constructor, generator, context)
     return None
 
 
@@ -286,10 +432,11 @@ def generate_unexpected_annotation(
     return None
 
 
+@dispatch_on(typing.Annotated)
 def generate_annotated(context: AnnotationProcessingContext) -> typing.Iterator[Any] | None:
     if context.origin is typing.Annotated:
         annotated_inner = [*context.args, Any][0]
-        examples = (v for ex in context.args[1:] if isinstance(ex, Examples) for v in ex)
+        examples = [v for ex in context.args[1:] if isinstance(ex, Examples) for v in ex]
         if examples:
             return gen.one_of(*examples)
 
@@ -303,24 +450,110 @@ def _dataclass_has_default(field: dataclasses.Field) -> bool:
     )
 
 
-def generate_forward_refs(context: AnnotationProcessingContext) -> typing.Iterator | None:
-    match = isinstance(context.source, typing.ForwardRef)
-    if not match:
+_forward_ref_types: tuple[type, ...] = (typing.ForwardRef,)
+try:
+    import typing_extensions
+
+    _forward_ref_types = (typing.ForwardRef, typing_extensions.ForwardRef)
+except ImportError:
+    pass
+
+_exhausted = object()
+# Forward refs resolved per globals mapping, by (id(globals), forward arg).  Entries keep their mapping alive, so
+# that its id cannot be reused while cached.
+_resolved_forward_refs: "collections.OrderedDict[tuple[int, str], tuple[dict[str, Any], Any, Any]]" = (
+    collections.OrderedDict()
+)
+_resolved_forward_refs_maxsize = 256
+
+
+def resolve_forward_ref(ref: typing.ForwardRef, globals: dict[str, Any]) -> Any:
+    """
+    Looks up the type a forward ref names in globals, once per globals mapping.  Unlike `ForwardRef._evaluate`, the
+    resolved type is returned as is, with its own forward refs left unevaluated, so that every level of a recursive
+    type steps into the very same annotation and reuses its generation plan.  Entries are invalidated when the
+    name is rebound in globals.
+    """
+    name = ref.__forward_arg__
+    key = (id(globals), name)
+    target = globals[name]
+    entry = _resolved_forward_refs.get(key)
+    if entry is not None and entry[0] is globals and entry[1] is target:
         try:
-            import typing_extensions
-
-            match = isinstance(context.source, typing_extensions.ForwardRef)
-        except ImportError:
+            _resolved_forward_refs.move_to_end(key)
+        except KeyError:
+            # Evicted by another thread in the meantime, the entry is still valid.
             pass
-    if match:
+        return entry[2]
+
+    resolved = typing.ForwardRef(target) if isinstance(target, str) else target
+    _resolved_forward_refs[key] = (globals, target, resolved)
+    evict_lru(_resolved_forward_refs, _resolved_forward_refs_maxsize)
+    return resolved
+
+
+def is_recursive(annotation: Any) -> bool:
+    """
+    Whether annotation refers to a forward ref, through which it could recurse.
+    """
+    if isinstance(annotation, (str, *_forward_ref_types)):
+        return True
+    return any(is_recursive(arg) for arg in typing.get_args(annotation))
+
+
+@contextlib.contextmanager
+def _sized_children(r: random.Random, context: AnnotationProcessingContext) -> Iterator[int]:
+    """
+    Picks the length of a collection within a recursive value, QuickCheck `sized` style: the collection is one
+    node of the current session's size, and its items split the rest evenly, so that a recursive value never
+    exceeds `context.size` nodes.  A collection outside of any recursive value starts a new one.
+    """
+    session = gen.session
+    parent_size = session.size
+    size = context.size if parent_size is None else parent_size
+    length = r.randint(0, min(5, size - 1)) if size > 1 else 0
+    session.size = (size - 1) // length if length else 0
+    try:
+        yield length
+    finally:
+        session.size = parent_size
+
+
+def _sized_collections(
+    constructor: typing.Callable[[list], Any],
+    generator: Iterator[Any],
+    context: AnnotationProcessingContext,
+) -> Iterator[Any]:
+    for r in gen:
+        with _sized_children(r, context) as length:
+            items = [i for _, i in zip(range(length), generator)]
+        yield constructor(items)
+
+
+@dispatch_on(*_forward_ref_types)
+def generate_forward_refs(context: AnnotationProcessingContext) -> typing.Iterator | None:
+    if isinstance(context.source, _forward_ref_types):
         ref = typing.cast(typing.ForwardRef, context.source)
         if ref.__forward_arg__ not in context.globals:
             raise GenerationError(f"Could not resolve forward ref {ref.__forward_arg__}")
 
         def generate_for_forward_ref():
-            t = ref._evaluate(context.globals, locals(), frozenset())
-            for i in context.step(t, ref.__forward_arg__, recursive=True):
-                yield i
+            t = resolve_forward_ref(ref, context.globals)
+            iterator = context.step(t, ref.__forward_arg__, recursive=True)
+            while True:
+                session = gen.session
+                if session.size is not None:
+                    value = next(iterator, _exhausted)
+                else:
+                    # The root of a recursive value, which its collections split the size of.
+                    session.size = context.size
+                    try:
+                        value = next(iterator, _exhausted)
+                    finally:
+                        session.size = None
+                if value is _exhausted:
+                    return
+                yield value
 
         return generate_for_forward_ref()
     return None
@@ -0,0 +1,369 @@
+import dataclasses
+import datetime
+import enum
+import itertools
+import math
+import string
+import types
+import typing
+from typing import Any, Iterable, Iterator
+
+from johen.examples import Examples
+from johen.exc import GenerationError
+from johen.generators.annotations import AnnotationProcessingContext, dispatch_on
+from johen.random import gen
+
+__all__ = ["Constraints", "generate_constrained"]
+
+try:
+    import annotated_types
+
+    _has_annotated_types = True
+except ImportError:  # pragma: no cover
+    _has_annotated_types = False
+
+_alphabet = string.ascii_letters + string.digits
+# The span of dates and datetimes bounded on one side only, matching `specialized.dates`.
+_default_span = datetime.timedelta(days=365 * 20)
+
+
+@dataclasses.dataclass
+class Constraints:
+    """
+    The `annotated_types` metadata of an `Annotated` type (as produced by pydantic's `Field(ge=..., max_length=...)`
+    among others), merged into the tightest bounds.
+    """
+
+    lower: Any = None
+    lower_inclusive: bool = True
+    upper: Any = None
+    upper_inclusive: bool = True
+    multiple_of: Any = None
+    min_length: int = 0
+    max_length: int | None = None
+    predicates: list[typing.Callable[[Any], bool]] = dataclasses.field(default_factory=list)
+
+    @classmethod
+    def from_metadata(cls, metadata: Iterable[Any]) -> "Constraints | None":
+        """
+        None when metadata contains no constraint that is understood.
+        """
+        if not _has_annotated_types:
+            return None
+
+        constraints = cls()
+        found = False
+        for m in metadata:
+            if isinstance(m, annotated_types.GroupedMetadata):
+                nested = cls.from_metadata(m)
+                if nested is not None:
+                    constraints.merge(nested)
+                    found = True
+                continue
+
+            if isinstance(m, annotated_types.Gt):
+                constraints.bound_lower(m.gt, False)
+            elif isinstance(m, annotated_types.Ge):
+                constraints.bound_lower(m.ge, True)
+            elif isinstance(m, annotated_types.Lt):
+                constraints.bound_upper(m.lt, False)
+            elif isinstance(m, annotated_types.Le):
+                constraints.bound_upper(m.le, True)
+            elif isinstance(m, annotated_types.MultipleOf):
+                constraints.multiple_of = m.multiple_of
+            elif isinstance(m, annotated_types.MinLen):
+                constraints.min_length = max(constraints.min_length, m.min_length)
+            elif isinstance(m, annotated_types.MaxLen):
+                constraints.bound_length(m.max_length)
+            elif isinstance(m, annotated_types.Predicate):
+                constraints.predicates.append(m.func)
+            else:
+                continue
+            found = True
+        return constraints if found else None
+
+    def bound_lower(self, value: Any, inclusive: bool):
+        if self.lower is None or value > self.lower or (value == self.lower and not inclusive):
+            self.lower, self.lower_inclusive = value, inclusive
+
+    def bound_upper(self, value: Any, inclusive: bool):
+        if self.upper is None or value < self.upper or (value == self.upper and not inclusive):
+            self.upper, self.upper_inclusive = value, inclusive
+
+    def bound_length(self, max_length: int):
+        if self.max_length is None or max_length < self.max_length:
+            self.max_length = max_length
+
+    def merge(self, other: "Constraints"):
+        if other.lower is not None:
+            self.bound_lower(other.lower, other.lower_inclusive)
+        if other.upper is not None:
+            self.bound_upper(other.upper, other.upper_inclusive)
+        if other.multiple_of is not None:
+            self.multiple_of = other.multiple_of
+        self.min_length = max(self.min_length, other.min_length)
+        if other.max_length is not None:
+            self.bound_length(other.max_length)
+        self.predicates.extend(other.predicates)
+
+    @property
+    def step(self) -> Any:
+        """
+        The positive multiple_of, or 1 when unset.
+        """
+        return abs(self.multiple_of) if self.multiple_of is not None else 1
+
+    def int_bounds(self) -> tuple[int | None, int | None]:
+        """
+        The inclusive integer bounds of the value, or of its quotient by multiple_of.  Quotients are taken of the
+        exact bounds, so that fractional multiples (of floats) stay within them.
+        """
+        step = self.step
+        lower, upper = self.lower, self.upper
+        if lower is not None:
+            lower = int(lower // step) + 1 if not self.lower_inclusive else -int(-lower // step)
+        if upper is not None:
+            upper = -int(-upper // step) - 1 if not self.upper_inclusive else int(upper // step)
+        return lower, upper
+
+    def admits(self, value: Any) -> bool:
+        """
+        Whether value is within the bounds.
+        """
+        if self.lower is not None and (
+            value < self.lower or (value == self.lower and not self.lower_inclusive)
+        ):
+            return False
+        if self.upper is not None and (
+            value > self.upper or (value == self.upper and not self.upper_inclusive)
+        ):
+            return False
+        return True
+
+    def length_bounds(self) -> tuple[int, int]:
+        # Unbounded lengths match those of `generate_lists_sets_frozen_sets`.
+        upper = self.max_length if self.max_length is not None else self.min_length + 5
+        return self.min_length, upper
+
+
+def _offsets() -> Iterator[int]:
+    # Distributed like `specialized.unsigned_ints`.
+    return map(lambda r: r.getrandbits(2 ** r.randint(0, 6)), gen)
+
+
+def _ints_between(lower: int | None, upper: int | None) -> Iterator[int]:
+    """
+    Uniform within both bounds, and biased towards them, as boundaries are where bugs tend to be.
+    """
+    if lower is not None and upper is not None:
+        return (
+            (lower, upper)[r.getrandbits(1)] if not r.getrandbits(3) else r.randint(lower, upper)
+            for r in gen
+        )
+    if lower is not None:
+        return (lower + offset for offset in _offsets())
+    if upper is not None:
+        return (upper - offset for offset in _offsets())
+    return (offset if r.getrandbits(1) else -offset for r, offset in zip(gen, _offsets()))
+
+
+def _constrained_ints(
+    constraints: Constraints, context: AnnotationProcessingContext
+) -> Iterator[Any]:
+    step = constraints.step
+    if not step or step % 1:
+        raise GenerationError(
+            f"multiple_of {constraints.multiple_of} is not a positive integer for {' '.join(context.path)}"
+        )
+    step = int(step)
+    lower, upper = constraints.int_bounds()
+    if lower is not None and upper is not None and lower > upper:
+        raise GenerationError(f"No value satisfies {constraints} for {' '.join(context.path)}")
+    return (context.source(i * step) for i in _ints_between(lower, upper))
+
+
+def _constrained_floats(
+    constraints: Constraints, context: AnnotationProcessingContext
+) -> Iterator[float]:
+    if constraints.multiple_of is not None:
+        step = constraints.step
+        if not step:
+            raise GenerationError(f"multiple_of is 0 for {' '.join(context.path)}")
+        lower, upper = constraints.int_bounds()
+        if lower is not None and upper is not None and lower > upper:
+            raise GenerationError(f"No value satisfies {constraints} for {' '.join(context.path)}")
+        # Products of a fractional step may round past a bound.
+        values = (float(i * step) for i in _ints_between(lower, upper))
+        return filter(constraints.admits, values)
+
+    lower, upper = constraints.lower, constraints.upper
+    if (
+        lower is not None
+        and upper is not None
+        and (
+            lower > upper
+            or (
+                lower == upper and not (constraints.lower_inclusive and constraints.upper_inclusive)
+            )
+        )
+    ):
+        raise GenerationError(f"No value satisfies {constraints} for {' '.join(context.path)}")
+
+    def floats() -> Iterator[float]:
+        for r in gen:
+            if lower is not None and upper is not None:
+                if not r.getrandbits(3):
+                    value = float((lower, upper)[r.getrandbits(1)])
+                else:
+                    value = r.uniform(lower, upper)
+            else:
+                # Spread over several orders of magnitude away from the only bound.
+                offset = r.expovariate(1.0) * 10 ** r.randint(-3, 6)
+                value = (
+                    lower + offset
+                    if lower is not None
+                    else upper - offset
+                    if upper is not None
+                    else offset
+                )
+            if math.isfinite(value) and constraints.admits(value):
+                yield value
+
+    return floats()
+
+
+def _constrained_dates(
+    constraints: Constraints, context: AnnotationProcessingContext
+) -> Iterator[datetime.date]:
+    # Dates step by days, datetimes by microseconds.
+    unit = (
+        datetime.timedelta(days=1)
+        if context.source is datetime.date
+        else datetime.timedelta(microseconds=1)
+    )
+    lower, upper = constraints.lower, constraints.upper
+    if lower is not None and not constraints.lower_inclusive:
+        lower += unit
+    if upper is not None and not constraints.upper_inclusive:
+        upper -= unit
+    if lower is None and upper is None:
+        lower = (
+            datetime.datetime(2013, 1, 1)
+            if context.source is datetime.datetime
+            else datetime.date(2013, 1, 1)
+        )
+    if lower is None:
+        lower = upper - _default_span
+    if upper is None:
+        upper = lower + _default_span
+    if lower > upper:
+        raise GenerationError(f"No value satisfies {constraints} for {' '.join(context.path)}")
+
+    steps = (upper - lower) // unit
+    return (lower + unit * i for i in _ints_between(0, steps))
+
+
+def _constrained_lengths(
+    constraints: Constraints, context: AnnotationProcessingContext
+) -> Iterator[Any] | None:
+    min_length, max_length = constraints.length_bounds()
+    if min_length > max_length:
+        raise GenerationError(f"No length satisfies {constraints} for {' '.join(context.path)}")
+    lengths = _ints_between(min_length, max_length)
+
+    if context.concretely_implemented_by(str):
+        return ("".join(r.choices(_alphabet, k=n)) for r, n in zip(gen, lengths))
+    if context.concretely_implemented_by(bytes):
+        return (r.randbytes(n) for r, n in zip(gen, lengths))
+
+    origin = context.origin if context.origin is not None else context.source
+    args = context.args
+    if origin in (list, tuple) and (origin is list or (len(args) == 2 and args[1] is ...)):
+        items = context.step(next(iter(args), Any))
+        return (origin(values) for values in _sized(lengths, items))
+    if origin in (set, frozenset):
+        items = context.step(next(iter(args), Any))
+        return (origin(values) for values in _distinct(lengths, items))
+    if origin is dict:
+        # Stepped as `generate_dicts` steps, so that paths do not depend on constraints.
+        key_type, value_type = [*args, Any, Any][:2]
+        keys, values = context.step(key_type, "[Key]"), context.step(value_type, "[Value]")
+        return _dicts(lengths, keys, values)
+    return None
+
+
+# Iterators end, rather than raising StopIteration within the generators below, when `gen` runs out of draws.
+_exhausted = object()
+
+
+def _sized(lengths: Iterator[int], items: Iterator[Any]) -> Iterator[list[Any]]:
+    for n in lengths:
+        values = list(itertools.islice(items, n))
+        if len(values) < n:
+            return
+        yield values
+
+
+def _distinct(lengths: Iterator[int], items: Iterator[Any]) -> Iterator[list[Any]]:
+    for n in lengths:
+        # Repeated items draw from `gen` again, so a domain smaller than n ends with max_iterations.
+        distinct: dict[Any, None] = {}
+        while len(distinct) < n:
+            item = next(items, _exhausted)
+            if item is _exhausted:
+                return
+            distinct[item] = None
+        yield list(distinct)
+
+
+def _dicts(lengths: Iterator[int], keys: Iterator[Any], values: Iterator[Any]) -> Iterator[dict]:
+    for distinct in _distinct(lengths, keys):
+        drawn = list(itertools.islice(values, len(distinct)))
+        if len(drawn) < len(distinct):
+            return
+        yield dict(zip(distinct, drawn))
+
+
+def _constrained(
+    constraints: Constraints, context: AnnotationProcessingContext
+) -> Iterator[Any] | None:
+    source = context.source
+    if context.origin is None and isinstance(source, type):
+        if issubclass(source, (bool, enum.Enum)):
+            return None
+        if issubclass(source, int):
+            return _constrained_ints(constraints, context)
+        if issubclass(source, float):
+            return _constrained_floats(constraints, context)
+        if source in (datetime.date, datetime.datetime):
+            return _constrained_dates(constraints, context)
+    return _constrained_lengths(constraints, context)
+
+
+@dispatch_on(typing.Annotated)
+def generate_constrained(context: AnnotationProcessingContext) -> Iterator[Any] | None:
+    """
+    Samples directly within the bounds of `annotated_types` constraints, for ints, floats, dates and datetimes,
+    and within the length bounds of strings, bytes, lists, variadic tuples, sets and dicts.  Predicates filter the
+    result.  Constraints on a union apply to each of its members.  `Examples` take precedence.
+    """
+    if context.origin is not typing.Annotated or not context.args:
+        return None
+    inner, metadata = context.args[0], context.args[1:]
+    if any(isinstance(m, Examples) for m in metadata):
+        return None
+    constraints = Constraints.from_metadata(metadata)
+    if constraints is None:
+        return None
+
+    if typing.get_origin(inner) in (typing.Union, types.UnionType):
+        members = tuple(typing.Annotated[(m, *metadata)] for m in typing.get_args(inner))
+        return context.step(typing.Union[members])
+
+    result = _constrained(constraints, context.child(inner))
+    if result is None:
+        return None
+    if constraints.predicates:
+        predicates = constraints.predicates
+        return filter(lambda v: all(p(v) for p in predicates), result)
+    return result
@@ -0,0 +1,243 @@
+import dataclasses
+import typing
+from typing import Any, Callable, Iterator
+
+import numpy as np
+import numpy.typing as npt
+
+from johen.examples import Examples
+from johen.exc import GenerationError
+from johen.generators.annotations import AnnotationProcessingContext, dispatch_on
+from johen.generators.constraints import Constraints
+from johen.random import gen
+
+__all__ = ["Shape", "generate_arrays"]
+
+# Draws an array of the given shape from a numpy generator.
+_Draw = Callable[[np.random.Generator, tuple[int, ...]], np.ndarray]
+
+# The length of unsized dimensions, matching `generate_lists_sets_frozen_sets`.
+_max_dimension = 5
+# The width of unsized str_ and bytes_ dtypes.
+_default_width = 5
+# Half the span of quotients by the multiple_of of floats unbounded on a side.
+_unbounded_quotients = 2**31
+_epoch = np.datetime64("2013-01-01T00:00:00", "s")
+_span_seconds = 365 * 20 * 86400
+
+# Abstract scalar types (as in `NDArray[np.floating]`) cannot be converted to a dtype.
+_abstract_dtypes: dict[Any, np.dtype] = {
+    np.generic: np.dtype(np.float64),
+    np.number: np.dtype(np.float64),
+    np.inexact: np.dtype(np.float64),
+    np.floating: np.dtype(np.float64),
+    np.complexfloating: np.dtype(np.complex128),
+    np.integer: np.dtype(np.int64),
+    np.signedinteger: np.dtype(np.int64),
+    np.unsignedinteger: np.dtype(np.uint64),
+}
+
+
+@dataclasses.dataclass(frozen=True, init=False)
+class Shape:
+    """
+    `Annotated` metadata fixing the shape of generated arrays, eg `Annotated[NDArray[np.int8], Shape(3, None)]`.
+    None dimensions are 0 to 5 long.  Arrays without a `Shape` have a single such dimension.
+    """
+
+    dimensions: tuple[int | None, ...]
+
+    def __init__(self, *dimensions: int | None):
+        object.__setattr__(self, "dimensions", dimensions)
+
+    def draw(self, r: Any) -> tuple[int, ...]:
+        return tuple(r.randint(0, _max_dimension) if d is None else d for d in self.dimensions)
+
+
+def _scalar_dtype(scalar: Any) -> np.dtype:
+    if scalar in _abstract_dtypes:
+        return _abstract_dtypes[scalar]
+    if isinstance(scalar, type) and issubclass(scalar, np.generic):
+        return np.dtype(scalar)
+    # Any, or a TypeVar, as in the bare `NDArray`.
+    return np.dtype(np.float64)
+
+
+def _unalias(annotation: Any) -> Any:
+    # Recent numpy versions declare `NDArray` as a `type` alias, whose subscriptions have the alias as origin.
+    alias = typing.get_origin(annotation) or annotation
+    value = getattr(alias, "__value__", None)
+    if value is None:
+        return annotation
+    args = typing.get_args(annotation)
+    return value[args] if args else value
+
+
+def _array_dtype(annotation: Any) -> np.dtype:
+    # `NDArray[np.float64]` is `np.ndarray[tuple[Any, ...], np.dtype[np.float64]]`.
+    args = typing.get_args(annotation)
+    if len(args) < 2:
+        return np.dtype(np.float64)
+    return _scalar_dtype(next(iter(typing.get_args(args[1])), Any))
+
+
+def _int_draw(
+    dtype: np.dtype, constraints: Constraints, context: AnnotationProcessingContext
+) -> _Draw:
+    info = np.iinfo(dtype)
+    multiple = constraints.step
+    if not multiple or multiple % 1:
+        raise GenerationError(
+            f"multiple_of {constraints.multiple_of} is not a positive integer for {' '.join(context.path)}"
+        )
+    multiple = int(multiple)
+    # Bounds of the quotient by multiple, within the range of dtype.
+    lower, upper = -(-int(info.min) // multiple), int(info.max) // multiple
+    bounded_lower, bounded_upper = constraints.int_bounds()
+    if bounded_lower is not None:
+        lower = max(lower, bounded_lower)
+    if bounded_upper is not None:
+        upper = min(upper, bounded_upper)
+    if lower > upper:
+        raise GenerationError(f"No {dtype} satisfies {constraints} for {' '.join(context.path)}")
+    return lambda rng, shape: (
+        rng.integers(lower, upper, shape, dtype=dtype, endpoint=True) * dtype.type(multiple)
+    )
+
+
+def _float_multiple_draw(
+    dtype: np.dtype, constraints: Constraints, context: AnnotationProcessingContext
+) -> _Draw:
+    multiple = float(constraints.step)
+    if not multiple:
+        raise GenerationError(f"multiple_of is 0 for {' '.join(context.path)}")
+    # Quotients by multiple, the span of unbounded sides being that of an int32.
+    lower, upper = constraints.int_bounds()
+    if lower is None:
+        lower = -_unbounded_quotients if upper is None else upper - 2 * _unbounded_quotients
+    if upper is None:
+        upper = lower + 2 * _unbounded_quotients
+    if lower > upper:
+        raise GenerationError(f"No {dtype} satisfies {constraints} for {' '.join(context.path)}")
+    # Drawn as offsets from lower, which may itself be beyond the range of an int64.
+    start, span = float(lower), min(upper - lower, 2**62)
+    return lambda rng, shape: (
+        (start + rng.integers(0, span, shape, endpoint=True)) * multiple
+    ).astype(dtype)
+
+
+def _float_draw(
+    dtype: np.dtype, constraints: Constraints, context: AnnotationProcessingContext
+) -> _Draw:
+    if constraints.multiple_of is not None:
+        return _float_multiple_draw(dtype, constraints, context)
+    lower, upper = constraints.lower, constraints.upper
+    # The bounds as values of dtype, clamped to after drawing, as both rounding and casting can reach past them.
+    least = _dtype_bound(dtype, lower, constraints.lower_inclusive, np.inf)
+    most = _dtype_bound(dtype, upper, constraints.upper_inclusive, -np.inf)
+    if least is not None and most is not None and least > most:
+        raise GenerationError(f"No {dtype} satisfies {constraints} for {' '.join(context.path)}")
+
+    def draw(rng: np.random.Generator, shape: tuple[int, ...]) -> np.ndarray:
+        if lower is not None and upper is not None:
+            values = rng.uniform(lower, upper, shape)
+        else:
+            # Spread over several orders of magnitude away from the only bound, as `_constrained_floats`.
+            offsets = rng.exponential(1.0, shape) * 10.0 ** rng.integers(-3, 7, shape)
+            if lower is not None:
+                values = lower + offsets
+            elif upper is not None:
+                values = upper - offsets
+            else:
+                values = np.where(rng.integers(0, 2, shape, dtype=bool), offsets, -offsets)
+        values = values.astype(dtype)
+        if least is not None:
+            values = np.maximum(values, least)
+        if most is not None:
+            values = np.minimum(values, most)
+        return values
+
+    return draw
+
+
+def _dtype_bound(dtype: np.dtype, bound: Any, inclusive: bool, inwards: float) -> Any:
+    """
+    The value of dtype nearest to bound that satisfies it, stepping from bound towards inwards.
+    """
+    if bound is None:
+        return None
+    value = dtype.type(bound)
+    outside = value < bound if inwards > 0 else value > bound
+    if outside or (value == bound and not inclusive):
+        value = np.nextafter(value, dtype.type(inwards))
+    return value
+
+
+def _draw_for(
+    dtype: np.dtype, constraints: Constraints, context: AnnotationProcessingContext
+) -> _Draw | None:
+    """
+    Bounds and multiple_of apply to integer and float dtypes; other dtypes ignore constraints.
+    """
+    kind = dtype.kind
+    if kind == "b":
+        return lambda rng, shape: rng.integers(0, 2, shape, dtype=bool)
+    if kind in "iu":
+        return _int_draw(dtype, constraints, context)
+    if kind == "f":
+        return _float_draw(dtype, constraints, context)
+    if kind == "c":
+        floats = _float_draw(np.dtype(np.float64), Constraints(), context)
+        return lambda rng, shape: (floats(rng, shape) + 1j * floats(rng, shape)).astype(dtype)
+    if kind in "Mm":
+        # Datetimes span 20 years from 2013, timedeltas a day, at the dtype's unit or seconds.
+        unit_dtype = dtype if np.datetime_data(dtype)[0] != "generic" else np.dtype(f"{kind}8[s]")
+        if kind == "M":
+            return lambda rng, shape: (
+                _epoch + rng.integers(0, _span_seconds, shape).astype("m8[s]")
+            ).astype(unit_dtype)
+        return lambda rng, shape: rng.integers(0, 86400, shape).astype("m8[s]").astype(unit_dtype)
+    if kind in "US":
+        # Lowercase ascii letters filling the dtype's width, viewed from their code points.
+        width = (dtype.itemsize // (4 if kind == "U" else 1)) or _default_width
+        codes, view = ("<u4", f"<U{width}") if kind == "U" else ("u1", f"S{width}")
+        return lambda rng, shape: (
+            rng.integers(97, 123, (*shape, width), dtype=codes).view(view).reshape(shape)
+        )
+    return None
+
+
+# `type(npt.NDArray)` dispatches the subscriptions of NDArray where it is a `type` alias.
+@dispatch_on(np.ndarray, np.generic, typing.Annotated, type(npt.NDArray))
+def generate_arrays(context: AnnotationProcessingContext) -> Iterator[Any] | None:
+    """
+    Generates numpy arrays for `np.ndarray` and `numpy.typing.NDArray[...]` annotations, and scalars for numpy
+    scalar types, of bool, integer, float, complex, datetime64, timedelta64, str_ and bytes_ dtypes.  Each array
+    is filled in one vectorized step, from a `numpy.random.Generator` seeded by a single draw from `gen`.
+    `Annotated` arrays take their shape from `Shape` metadata, and their bounds from `annotated_types` metadata.
+    """
+    source, metadata = context.source, context.args[1:]
+    if context.origin is typing.Annotated and context.args:
+        source = context.args[0]
+        if any(isinstance(m, Examples) for m in metadata):
+            return None
+    else:
+        metadata = ()
+    source = _unalias(source)
+
+    if isinstance(source, type) and issubclass(source, np.generic):
+        dtype, shape = _scalar_dtype(source), Shape()
+    elif source is np.ndarray or typing.get_origin(source) is np.ndarray:
+        dtype = _array_dtype(source)
+        shape = next((m for m in metadata if isinstance(m, Shape)), Shape(None))
+    else:
+        return None
+
+    draw = _draw_for(dtype, Constraints.from_metadata(metadata) or Constraints(), context)
+    if draw is None:
+        return None
+
+    arrays = (draw(np.random.default_rng(r.getrandbits(64)), shape.draw(r)) for r in gen)
+    if not shape.dimensions:
+        return (a[()] for a in arrays)
+    return arrays
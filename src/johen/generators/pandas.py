@@ -0,0 +1,40 @@
+import typing
+from typing import Iterator
+
+import pandas as pd
+
+from johen.batch import compile_columns
+from johen.generators.annotations import AnnotationProcessingContext, dispatch_on
+from johen.generators.constraints import Constraints
+from johen.random import gen
+
+__all__ = ["generate_data_frames"]
+
+
+@dispatch_on(typing.Annotated)
+def generate_data_frames(context: AnnotationProcessingContext) -> Iterator[pd.DataFrame] | None:
+    """
+    Generates `Annotated[pd.DataFrame, Row]` frames with a column per field of Row, a dataclass, NamedTuple or
+    TypedDict.  Frames are generated column wise by `johen.batch.compile_columns`, primitive columns being drawn
+    as whole numpy arrays.  The number of rows follows `annotated_types` length metadata, 0 to 5 by default.
+    Optional columns are missing (NA) in some rows with generate_defaults="holes".
+    """
+    if context.origin is not typing.Annotated or context.args[:1] != (pd.DataFrame,):
+        return None
+    metadata = context.args[1:]
+    row = next((m for m in metadata if isinstance(m, type)), None)
+    if row is None:
+        return None
+
+    min_rows, max_rows = (Constraints.from_metadata(metadata) or Constraints()).length_bounds()
+    batch = compile_columns(context.child(row, "rows"), backend="numpy")
+
+    def frames() -> Iterator[pd.DataFrame]:
+        for r in gen:
+            columns = batch(r, r.randint(min_rows, max_rows))
+            frame = pd.DataFrame(columns.columns, index=pd.RangeIndex(columns.length))
+            for k, mask in columns.masks.items():
+                frame[k] = frame[k].where(mask)
+            yield frame
+
+    return frames()
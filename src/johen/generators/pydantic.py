@@ -1,31 +1,46 @@
-from typing import Any, Iterator, get_type_hints
+from typing import Annotated, Any, Iterator, get_type_hints
 
 from pydantic import BaseModel
 from pydantic.fields import FieldInfo
 from pydantic_core import PydanticUndefined
 
-from johen.generators.annotations import AnnotationProcessingContext
-from johen.generators.base import generate_dicts_for_annotations
+from johen.generators.annotations import AnnotationProcessingContext, dispatch_on
+from johen.generators.base import ModelSchema, generate_dicts_for_annotations, get_model_schema
 
 
 def generate_dicts_for_pydantic_model(
     context: "AnnotationProcessingContext",
 ) -> Iterator[dict[str, Any]]:
-    hints = get_type_hints(context.source, include_extras=True)
-    return generate_dicts_for_annotations(
-        {k: hints.get(k, Any) for k, field in context.source.model_fields.items()},
-        context,
+    schema = get_model_schema(context.source, _pydantic_schema)
+    return generate_dicts_for_annotations(schema.annotations, context, schema.optional_keys)
+
+
+def _pydantic_schema(source: Any) -> ModelSchema:
+    hints = get_type_hints(source, include_extras=True)
+    return ModelSchema(
+        annotations={
+            k: _constrained_annotation(hints.get(k, Any), field)
+            for k, field in source.model_fields.items()
+        },
         optional_keys=[
-            k for k, field in context.source.model_fields.items() if _pydantic_has_default(field)
+            k for k, field in source.model_fields.items() if _pydantic_has_default(field)
         ],
     )
 
 
+@dispatch_on(BaseModel)
 def generate_pydantic_instances(context: AnnotationProcessingContext) -> Iterator[BaseModel] | None:
     if isinstance(context.source, type) and issubclass(context.source, BaseModel):
         return (context.source(**d) for d in generate_dicts_for_pydantic_model(context))
     return None
 
 
+def _constrained_annotation(hint: Any, field: FieldInfo) -> Any:
+    # Constraints such as `Field(ge=1)` are only found in the field's metadata, along with any `Annotated` extras.
+    if field.metadata:
+        return Annotated[(field.annotation, *field.metadata)]
+    return hint
+
+
 def _pydantic_has_default(field: FieldInfo) -> bool:
     return field.default is not PydanticUndefined or field.default_factory is not None
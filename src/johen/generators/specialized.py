@@ -16,92 +16,89 @@ from typing import Annotated, Dict, List, Union
 from johen.examples import Examples
 from johen.random import gen
 
-simple_symbol = ("".join(r.sample(string.ascii_letters + "_", 5)) for r in gen)
-unsigned_ints = (r.getrandbits(2 ** r.randint(0, 6)) for r in gen)
-negative_ints = (i * -1 for i in unsigned_ints)
+simple_symbol = map(lambda r: "".join(r.sample(string.ascii_letters + "_", 5)), gen)
+unsigned_ints = map(lambda r: r.getrandbits(2 ** r.randint(0, 6)), gen)
+negative_ints = map(lambda i: i * -1, unsigned_ints)
 ints = gen.one_of(unsigned_ints, negative_ints, (0,))
-bit_packed_floats = (struct.unpack("d", struct.pack("Q", bits))[0] for bits in unsigned_ints)
-valid_floats = (v for v in bit_packed_floats if not math.isinf(v) and not math.isnan(v))
+bit_packed_floats = map(lambda bits: struct.unpack("d", struct.pack("Q", bits))[0], unsigned_ints)
+valid_floats = filter(lambda v: not math.isinf(v) and not math.isnan(v), bit_packed_floats)
 invalid_floats = gen.one_of((math.inf, math.nan))
 all_floats = gen.one_of(valid_floats, invalid_floats)
 bools = gen.one_of([True, False])
-objects = (object() for _ in gen)
-printable_strings = ("".join(r.sample(string.printable, r.randint(0, 6))) for r in gen)
-colors = gen.one_of(
-    [
-        "red",
-        "green",
-        "blue",
-        "orange",
-        "purple",
-        "cyan",
-        "magenta",
-        "magenta",
-        "yellow",
-        "gold",
-        "silver",
-        "black",
-        "white",
-    ]
-)
-things = gen.one_of(
-    [
-        "shirt",
-        "sneaker",
-        "shoe",
-        "apple",
-        "banana",
-        "orange",
-        "tea",
-        "sandwich",
-        "tennis",
-        "football",
-        "basketball",
-        "fork",
-        "table",
-        "computer",
-    ]
-)
-names = gen.one_of(
-    [
-        "bob",
-        "alice",
-        "jennifer",
-        "john",
-        "mary",
-        "jane",
-        "sally",
-        "fred",
-        "dan",
-        "alex",
-        "margaret",
-        "vincent",
-        "timothy",
-        "samuel",
-    ]
-)
-ascii_words = ("-".join(group) for group in zip(colors, names, things))
-dates = (
-    datetime.date(2013, 1, 1)
+objects = map(lambda _: object(), gen)
+printable_strings = map(lambda r: "".join(r.sample(string.printable, r.randint(0, 6))), gen)
+color_words = [
+    "red",
+    "green",
+    "blue",
+    "orange",
+    "purple",
+    "cyan",
+    "magenta",
+    "magenta",
+    "yellow",
+    "gold",
+    "silver",
+    "black",
+    "white",
+]
+colors = gen.one_of(color_words)
+thing_words = [
+    "shirt",
+    "sneaker",
+    "shoe",
+    "apple",
+    "banana",
+    "orange",
+    "tea",
+    "sandwich",
+    "tennis",
+    "football",
+    "basketball",
+    "fork",
+    "table",
+    "computer",
+]
+things = gen.one_of(thing_words)
+name_words = [
+    "bob",
+    "alice",
+    "jennifer",
+    "john",
+    "mary",
+    "jane",
+    "sally",
+    "fred",
+    "dan",
+    "alex",
+    "margaret",
+    "vincent",
+    "timothy",
+    "samuel",
+]
+names = gen.one_of(name_words)
+ascii_words = map("-".join, zip(colors, names, things))
+dates = map(
+    lambda r: datetime.date(2013, 1, 1)
     + datetime.timedelta(
         days=r.randint(0, 365 * 20),
-    )
-    for r in gen
+    ),
+    gen,
 )
-datetimes = (
-    datetime.datetime(2013, 1, 1, 1)
+datetimes = map(
+    lambda r: datetime.datetime(2013, 1, 1, 1)
     + datetime.timedelta(
         days=r.randint(0, 365 * 20),
         seconds=r.randint(0, 60 * 60 * 24),
         milliseconds=r.randint(0, 1000),
-    )
-    for r in gen
+    ),
+    gen,
 )
-positive_timedeltas = (
-    datetime.timedelta(seconds=r.randint(0, 59), hours=r.randint(0, 23)) for r in gen
+positive_timedeltas = map(
+    lambda r: datetime.timedelta(seconds=r.randint(0, 59), hours=r.randint(0, 23)), gen
 )
-uuids = (uuid.UUID(int=r.getrandbits(128), version=4) for r in gen)
-uuid_hexes = (uid.hex for uid in uuids)
+uuids = map(lambda r: uuid.UUID(int=r.getrandbits(128), version=4), gen)
+uuid_hexes = map(lambda uid: uid.hex, uuids)
 file_extensions = gen.one_of(
     (".jpg", ".png", ".gif", ".txt", ".py", ".ts", ".c", ".obj", ".ini", "")
 )
@@ -128,17 +125,15 @@ path_segments = gen.one_of(
     ),
     uuid_hexes,
 )
-file_paths = (
-    lead + "/".join(segment for _, segment in segments) + ext
-    for lead, segments, ext in zip(
-        gen.one_of(("", "/")),
-        (zip(range(r.randint(1, 8)), path_segments) for r in gen),
-        file_extensions,
-    )
+file_paths = map(
+    lambda lead, segments, ext: lead + "/".join(segment for _, segment in segments) + ext,
+    gen.one_of(("", "/")),
+    map(lambda r: zip(range(r.randint(1, 8)), path_segments), gen),
+    file_extensions,
 )
-file_names = (segment + ext for segment, ext in zip(path_segments, file_extensions))
-byte_strings = (s.encode("utf8") for s in printable_strings)
-sha1s = (hashlib.sha1(s).hexdigest() for s in byte_strings)
+file_names = map(lambda segment, ext: segment + ext, path_segments, file_extensions)
+byte_strings = map(lambda s: s.encode("utf8"), printable_strings)
+sha1s = map(lambda s: hashlib.sha1(s).hexdigest(), byte_strings)
 json_primitives = gen.one_of(ascii_words, ints, bools, valid_floats, itertools.repeat(None))
 nones = itertools.repeat(None)
 
@@ -4,10 +4,11 @@ from typing import Any, get_type_hints
 
 import sqlalchemy.orm
 
-from johen.generators.annotations import AnnotationProcessingContext
-from johen.generators.base import generate_dicts_for_annotations
+from johen.generators.annotations import AnnotationProcessingContext, dispatch_on
+from johen.generators.base import ModelSchema, generate_dicts_for_annotations, get_model_schema
 
 
+@dispatch_on(sqlalchemy.orm.DeclarativeBase)
 def generate_sqlalchemy_instance(
     context: AnnotationProcessingContext,
 ) -> typing.Iterator[Any] | None:
@@ -16,28 +17,31 @@ def generate_sqlalchemy_instance(
     if inspect.isclass(context.source) and issubclass(
         context.source, sqlalchemy.orm.DeclarativeBase
     ):
-        hints = get_type_hints(context.source, include_extras=True)
-        inspection = sqlalchemy.inspect(context.source)
+        schema = get_model_schema(context.source, _sqlalchemy_schema)
         dict_generator = generate_dicts_for_annotations(
-            {
-                c.key: next(iter(typing.get_args(hint)), Any)  # type: ignore
-                if typing.get_origin(hint) is sqlalchemy.orm.Mapped
-                else hint
-                for c in inspection.c
-                for hint in (hints.get(c.key, Any),)
-            },
-            context,
-            optional_keys=[
-                c.key
-                for c in inspection.c
-                if (
-                    c.primary_key
-                    or c.nullable
-                    or c.default is not None
-                    or c.server_default is not None
-                )
-            ],
+            schema.annotations, context, schema.optional_keys
         )
 
         return (context.source(**d) for d in dict_generator)
     return None
+
+
+def _sqlalchemy_schema(source: Any) -> ModelSchema:
+    hints = get_type_hints(source, include_extras=True)
+    inspection = sqlalchemy.inspect(source)
+    return ModelSchema(
+        annotations={
+            c.key: next(iter(typing.get_args(hint)), Any)
+            if typing.get_origin(hint) is sqlalchemy.orm.Mapped
+            else hint
+            for c in inspection.c
+            for hint in (hints.get(c.key, Any),)
+        },
+        optional_keys=[
+            c.key
+            for c in inspection.c
+            if (
+                c.primary_key or c.nullable or c.default is not None or c.server_default is not None
+            )
+        ],
+    )
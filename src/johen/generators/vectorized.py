@@ -0,0 +1,188 @@
+import dataclasses
+import datetime
+import uuid
+from typing import Any, Callable
+
+import numpy as np
+
+from johen.generators import specialized
+from johen.random import gen
+
+__all__ = [
+    "Blocks",
+    "unsigned_int_array",
+    "int_array",
+    "negative_int_array",
+    "valid_float_array",
+    "bool_array",
+    "uuid_array",
+    "date_array",
+    "datetime_array",
+    "positive_timedelta_array",
+    "unsigned_ints",
+    "negative_ints",
+    "ints",
+    "valid_floats",
+    "bools",
+    "uuids",
+    "dates",
+    "datetimes",
+    "positive_timedeltas",
+    "type_matchers",
+    "leaf_arrays",
+]
+
+# Arrays of n values of a primitive, drawn from the given generator.
+ArrayDraw = Callable[[np.random.Generator, int], np.ndarray]
+
+_exhausted = object()
+_epoch_date = np.datetime64("2013-01-01", "D")
+_epoch_datetime = np.datetime64("2013-01-01T01:00", "ms")
+
+
+def unsigned_int_array(rng: np.random.Generator, n: int) -> np.ndarray:
+    """
+    uint64s of 1 to 64 random bits, distributed as `specialized.unsigned_ints`.
+    """
+    bits = rng.integers(0, 1 << 64, n, dtype=np.uint64, endpoint=False)
+    widths = np.left_shift(np.uint64(1), rng.integers(0, 7, n, dtype=np.uint64))
+    return bits >> (np.uint64(64) - widths)
+
+
+def int_array(rng: np.random.Generator, n: int) -> np.ndarray:
+    """
+    Unsigned, negative or 0, as `specialized.ints`.  Negated uint64s do not fit any integer dtype, so these are
+    python ints in an object array.
+    """
+    magnitudes = unsigned_int_array(rng, n).tolist()
+    signs = rng.integers(-1, 2, n).tolist()
+    return np.array([s * m for s, m in zip(signs, magnitudes)], dtype=object)
+
+
+def negative_int_array(rng: np.random.Generator, n: int) -> np.ndarray:
+    return np.array([-m for m in unsigned_int_array(rng, n).tolist()], dtype=object)
+
+
+def valid_float_array(rng: np.random.Generator, n: int) -> np.ndarray:
+    """
+    The bits of `unsigned_int_array` reinterpreted as float64, excluding infinities and nans, as
+    `specialized.valid_floats`.
+    """
+    blocks: list[np.ndarray] = []
+    missing = n
+    while missing > 0:
+        floats = unsigned_int_array(rng, missing).view(np.float64)
+        floats = floats[np.isfinite(floats)]
+        blocks.append(floats)
+        missing -= len(floats)
+    return np.concatenate(blocks) if blocks else np.empty(0, dtype=np.float64)
+
+
+def bool_array(rng: np.random.Generator, n: int) -> np.ndarray:
+    return rng.integers(0, 2, n, dtype=np.uint8).astype(bool)
+
+
+def uuid_array(rng: np.random.Generator, n: int) -> np.ndarray:
+    """
+    The 16 bytes of n version 4 uuids, as an (n, 16) uint8 array.
+    """
+    raw = rng.integers(0, 256, (n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    return raw
+
+
+def date_array(rng: np.random.Generator, n: int) -> np.ndarray:
+    return _epoch_date + rng.integers(0, 365 * 20 + 1, n).astype("timedelta64[D]")
+
+
+def datetime_array(rng: np.random.Generator, n: int) -> np.ndarray:
+    days = rng.integers(0, 365 * 20 + 1, n)
+    seconds = rng.integers(0, 60 * 60 * 24 + 1, n)
+    milliseconds = rng.integers(0, 1001, n)
+    return _epoch_datetime + ((days * 86400 + seconds) * 1000 + milliseconds).astype(
+        "timedelta64[ms]"
+    )
+
+
+def positive_timedelta_array(rng: np.random.Generator, n: int) -> np.ndarray:
+    seconds = rng.integers(0, 60, n) + rng.integers(0, 24, n) * 3600
+    return seconds.astype("timedelta64[s]")
+
+
+def _uuids(raw: np.ndarray) -> list[uuid.UUID]:
+    data = raw.tobytes()
+    return [uuid.UUID(bytes=data[i : i + 16]) for i in range(0, len(data), 16)]
+
+
+@dataclasses.dataclass(eq=False)
+class Blocks:
+    """
+    An iterator handing out values drawn in blocks from a `numpy.random.Generator`.  Each block is seeded by a
+    single draw from `gen`, and buffered in the current `GenerationSession`, which drops it whenever it is
+    reseeded; values are thus deterministic for each example, like those of any other source.  Blocks start small,
+    as most examples only need a few values, and double up to max_block while the same example keeps drawing.
+    """
+
+    draw: ArrayDraw
+    to_values: Callable[[np.ndarray], list[Any]] = np.ndarray.tolist
+    min_block: int = 16
+    max_block: int = 4096
+
+    def __iter__(self) -> "Blocks":
+        return self
+
+    def __next__(self) -> Any:
+        buffers = gen.session.buffers
+        buffered = buffers.get(self)
+        if buffered is not None:
+            value = next(buffered[0], _exhausted)
+            if value is not _exhausted:
+                return value
+            size = min(buffered[1] * 2, self.max_block)
+        else:
+            size = self.min_block
+        values = iter(self.to_values(self.array(size)))
+        buffers[self] = (values, size)
+        return next(values)
+
+    def array(self, n: int) -> np.ndarray:
+        """
+        n values as an array, for consumers that handle them in bulk.  Draws once from `gen`.
+        """
+        return self.draw(np.random.default_rng(next(gen).getrandbits(64)), n)
+
+
+unsigned_ints = Blocks(unsigned_int_array)
+negative_ints = Blocks(negative_int_array)
+ints = Blocks(int_array)
+valid_floats = Blocks(valid_float_array)
+bools = Blocks(bool_array)
+uuids = Blocks(uuid_array, _uuids)
+dates = Blocks(date_array)
+datetimes = Blocks(datetime_array)
+positive_timedeltas = Blocks(positive_timedelta_array)
+
+# The array draws equivalent to the iterators of `specialized`, by iterator.  Each draws one value per row, so
+# uuids, which are drawn as rows of 16 bytes, are not included.
+leaf_arrays: dict[Any, ArrayDraw] = {
+    specialized.unsigned_ints: unsigned_int_array,
+    specialized.negative_ints: negative_int_array,
+    specialized.ints: int_array,
+    specialized.valid_floats: valid_float_array,
+    specialized.bools: bool_array,
+    specialized.dates: date_array,
+    specialized.datetimes: datetime_array,
+    specialized.positive_timedeltas: positive_timedelta_array,
+}
+
+# Opt in with `global_config["type_matchers"].update(vectorized.type_matchers)`.
+type_matchers: dict[Any, Blocks] = {
+    int: ints,
+    float: valid_floats,
+    bool: bools,
+    uuid.UUID: uuids,
+    datetime.date: dates,
+    datetime.datetime: datetimes,
+    datetime.timedelta: positive_timedeltas,
+}
@@ -3,13 +3,44 @@ from typing import Any, Callable, Iterator, Literal, Type, TypeVar, cast, overlo
 
 from johen.config import ParametrizeConfig, compile_matchers, get_base_config
 from johen.generators.annotations import AnnotationMatcher, AnnotationProcessingContext
-from johen.random import gen
+from johen.random import GenerationSession, gen
 
 global_config: ParametrizeConfig = get_base_config()
 
 _A = TypeVar("_A")
 
 
+def generation_context(
+    obj: Any,
+    generate_defaults: bool | Literal["holes"] | None = None,
+    matchers: list[AnnotationMatcher] | None = None,
+    globals: dict[str, Any] | None = None,
+) -> AnnotationProcessingContext:
+    """
+    The root context for generating obj, with options falling back to the `global_config`.
+    """
+    context = AnnotationProcessingContext.from_source(obj)
+    context.size = global_config["size"]
+    context.union_weights = global_config["union_weights"]
+
+    if generate_defaults is not None:
+        context.generate_defaults = generate_defaults
+    else:
+        context.generate_defaults = global_config["generate_defaults"]
+
+    if matchers is not None:
+        context.matchers = [*matchers, *compile_matchers(global_config)]
+    else:
+        context.matchers = compile_matchers(global_config)
+
+    if globals is not None:
+        context.globals = {**global_config["globals"], **globals}
+    else:
+        context.globals = global_config["globals"]
+
+    return context
+
+
 @overload
 def generate(
     obj: Type[_A],
@@ -54,33 +85,31 @@ def generate(
     count: int | None = None,
     globals: dict[str, Any] | None = None,
 ) -> Iterator:
-    context = AnnotationProcessingContext.from_source(obj)
-
-    if generate_defaults is not None:
-        context.generate_defaults = generate_defaults
-    else:
-        context.generate_defaults = global_config["generate_defaults"]
-
-    if matchers is not None:
-        context.matchers = [*matchers, *compile_matchers(global_config)]
-    else:
-        context.matchers = compile_matchers(global_config)
-
-    if globals is not None:
-        context.globals = {**global_config["globals"], **globals}
-    else:
-        context.globals = global_config["globals"]
+    context = generation_context(obj, generate_defaults, matchers, globals)
 
+    session = gen.session
     if seed is not None:
-        gen.restart_at(seed=seed)
+        session = GenerationSession(
+            seed_strategy=global_config["seed_strategy"], prng=global_config["prng"]
+        )
+        session.restart_at(seed=seed)
+    session.remaining_iterations = global_config["max_iterations"]
+    max_example_seconds = global_config["max_example_seconds"]
+
+    def timed(iterator: Iterator) -> Iterator:
+        if max_example_seconds is None:
+            return iterator
+        return session.timed(iterator, max_example_seconds)
 
     if count is not None:
-        result = [i for i, _ in zip(context.generate(), range(count))]
+        with session:
+            result = [i for i, _ in zip(timed(context.generate()), range(count))]
         assert len(result) == count, f"Could not generate {count} values for {obj}"
         return iter(result)
 
-    gen.remaining_iterations = global_config["max_iterations"]
-    return context.generate()
+    if seed is not None:
+        return session.bind(timed(context.generate()))
+    return timed(context.generate())
 
 
 @contextlib.contextmanager
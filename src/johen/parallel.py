@@ -0,0 +1,210 @@
+import collections
+import concurrent.futures
+import dataclasses
+import math
+import multiprocessing.context
+import os
+import pickle
+import time
+from typing import Any, Callable, Iterator, Literal
+
+from johen.exc import GenerationError
+from johen.generators.annotations import AnnotationMatcher
+from johen.globals import generation_context, global_config
+from johen.random import PRNG, SeedStrategy, gen, seed_for_index
+
+__all__ = ["generate_parallel", "iter_parallel", "ShardReport"]
+
+
+@dataclasses.dataclass(frozen=True)
+class _Shard:
+    obj: Any
+    start: int
+    stop: int
+    seed: int
+    # The seed of the example at start.
+    start_seed: int
+    seed_strategy: SeedStrategy
+    prng: PRNG
+    max_iterations: int
+    max_example_seconds: float | None
+    generate_defaults: bool | Literal["holes"] | None
+    matchers: list[AnnotationMatcher] | None
+    globals: dict[str, Any] | None
+
+
+@dataclasses.dataclass(frozen=True)
+class ShardReport:
+    # The process that generated the shard.
+    pid: int
+    # The range of example indexes in the shard.
+    start: int
+    stop: int
+    # Time spent generating, and pickling the results, in the worker.
+    generate_seconds: float
+    pickle_seconds: float
+
+    @property
+    def examples_per_second(self) -> float:
+        seconds = self.generate_seconds + self.pickle_seconds
+        return (self.stop - self.start) / seconds if seconds else math.inf
+
+
+def _generate_shard(shard: _Shard) -> tuple[ShardReport, bytes]:
+    started = time.perf_counter()
+    context = generation_context(shard.obj, shard.generate_defaults, shard.matchers, shard.globals)
+    values = gen.wrap_deterministically(
+        context.generate(),
+        seed=shard.seed,
+        max_iterations=shard.max_iterations,
+        start=shard.start,
+        strategy=shard.seed_strategy,
+        prng=shard.prng,
+        max_example_seconds=shard.max_example_seconds,
+        start_seed=shard.start_seed,
+    )
+    result = [v for _, v in zip(range(shard.start, shard.stop), values)]
+    if len(result) != shard.stop - shard.start:
+        raise GenerationError(
+            f"Could not generate example {shard.start + len(result)} for {shard.obj!r}, check that constraint is not too strong."
+        )
+
+    generated = time.perf_counter()
+    try:
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        raise GenerationError(
+            f"Examples {shard.start}-{shard.stop} of {shard.obj!r} could not be pickled, generate_parallel requires picklable values: {e}"
+        ) from None
+
+    return (
+        ShardReport(
+            pid=os.getpid(),
+            start=shard.start,
+            stop=shard.stop,
+            generate_seconds=generated - started,
+            pickle_seconds=time.perf_counter() - generated,
+        ),
+        payload,
+    )
+
+
+def generate_parallel(
+    obj: Any,
+    count: int,
+    workers: int | None = None,
+    seed: int | None = None,
+    generate_defaults: bool | Literal["holes"] | None = None,
+    matchers: list[AnnotationMatcher] | None = None,
+    globals: dict[str, Any] | None = None,
+    shard_size: int | None = None,
+    on_shard: Callable[[ShardReport], None] | None = None,
+    mp_context: multiprocessing.context.BaseContext | None = None,
+) -> list:
+    """
+    Generates count examples of obj across a pool of worker processes.  Each worker regenerates its shard of the
+    index space directly from `(seed, index)`, see `johen.random.seed_for_index`, so that the result is identical
+    to (and in the same order as) generating with workers=1, which runs in this process.
+
+    Workers generate with their own `global_config`: with the "spawn" or "forkserver" start methods, any
+    customization of it must happen at import time of the modules defining obj.  obj, matchers and globals, as
+    well as the generated values, must be picklable.  `on_shard` receives each shard's `ShardReport`, in order.
+    """
+    return list(
+        iter_parallel(
+            obj,
+            count,
+            workers=workers,
+            seed=seed,
+            generate_defaults=generate_defaults,
+            matchers=matchers,
+            globals=globals,
+            shard_size=shard_size,
+            on_shard=on_shard,
+            mp_context=mp_context,
+        )
+    )
+
+
+def iter_parallel(
+    obj: Any,
+    count: int,
+    workers: int | None = None,
+    seed: int | None = None,
+    generate_defaults: bool | Literal["holes"] | None = None,
+    matchers: list[AnnotationMatcher] | None = None,
+    globals: dict[str, Any] | None = None,
+    shard_size: int | None = None,
+    on_shard: Callable[[ShardReport], None] | None = None,
+    mp_context: multiprocessing.context.BaseContext | None = None,
+) -> Iterator:
+    """
+    Like `generate_parallel`, but yields examples in order as their shard completes.  At most two shards per
+    worker are in flight, so memory is bounded by shard_size rather than count.
+    """
+    assert count > 0, "count must be greater than 0"
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if shard_size is None:
+        shard_size = max(1, math.ceil(count / (workers * 4)))
+    if seed is None:
+        seed = global_config["seed"] or 0
+
+    shards = (
+        _Shard(
+            obj=obj,
+            start=start,
+            stop=min(start + shard_size, count),
+            seed=seed,
+            start_seed=start_seed,
+            seed_strategy=global_config["seed_strategy"],
+            prng=global_config["prng"],
+            max_iterations=global_config["max_iterations"],
+            max_example_seconds=global_config["max_example_seconds"],
+            generate_defaults=generate_defaults,
+            matchers=matchers,
+            globals=globals,
+        )
+        for start, start_seed in _start_seeds(
+            seed, count, shard_size, global_config["seed_strategy"], global_config["prng"]
+        )
+    )
+
+    if workers <= 1:
+        for shard in shards:
+            yield from _unpack(_generate_shard(shard), on_shard)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=mp_context) as pool:
+        pending: collections.deque[concurrent.futures.Future] = collections.deque()
+        for shard in shards:
+            pending.append(pool.submit(_generate_shard, shard))
+            if len(pending) >= workers * 2:
+                yield from _unpack(pending.popleft().result(), on_shard)
+        while pending:
+            yield from _unpack(pending.popleft().result(), on_shard)
+
+
+def _start_seeds(
+    seed: int, count: int, shard_size: int, strategy: SeedStrategy, prng: PRNG
+) -> Iterator[tuple[int, int]]:
+    """
+    The index and seed of the first example of each shard.  Chained seeds are walked once, from one shard's start
+    to the next, rather than from the root seed for every shard.
+    """
+    start_seed = seed
+    for start in range(0, count, shard_size):
+        if strategy == "indexed":
+            start_seed = seed_for_index(seed, start, strategy, prng)
+        elif start:
+            start_seed = seed_for_index(start_seed, shard_size, strategy, prng)
+        yield start, start_seed
+
+
+def _unpack(
+    result: tuple[ShardReport, bytes], on_shard: Callable[[ShardReport], None] | None
+) -> list:
+    report, payload = result
+    if on_shard is not None:
+        on_shard(report)
+    return pickle.loads(payload)
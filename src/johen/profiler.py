@@ -0,0 +1,189 @@
+import contextlib
+import contextvars
+import dataclasses
+import json
+import re
+import threading
+import time
+from typing import Any, Callable, Iterator, TypeVar
+
+from johen.random import PRNG, GenerationSession, SeedStrategy, gen
+
+__all__ = ["GenerationProfiler", "PathStats", "profiler", "explain_exhaustion"]
+
+_A = TypeVar("_A")
+# Paths start with the repr of their root source, which for functions includes their (unstable) address.
+_address = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+@dataclasses.dataclass
+class PathStats:
+    # The values produced by iterators generated at this path.
+    values: int = 0
+    # Wall time and `gen` draws spent producing them, including and excluding that of nested paths.
+    seconds: float = 0.0
+    draws: int = 0
+    self_seconds: float = 0.0
+    self_draws: int = 0
+    # The number of steps from the root of the path.
+    depth: int = 0
+
+    def merge(self, other: "PathStats"):
+        self.depth = max(self.depth, other.depth)
+        self.values += other.values
+        self.seconds += other.seconds
+        self.draws += other.draws
+        self.self_seconds += other.self_seconds
+        self.self_draws += other.self_draws
+
+
+class _Stack(threading.local):
+    def __init__(self):
+        # The time and draws of the children of each iterator currently being advanced.
+        self.frames: list[list[Any]] = []
+        # How many of those iterators are at each path.  Nested iterators can share a path (such as the items of
+        # a list), only the outermost one accounts for the total time and draws of the path.
+        self.active: dict[str, int] = {}
+
+
+@dataclasses.dataclass
+class GenerationProfiler:
+    """
+    When enabled, wraps every iterator produced by `AnnotationProcessingContext.generate` to aggregate the cost of
+    its values by the context's path.  Draws are measured from the current session's `remaining_iterations`.
+    `profile` and `capture` only profile the generations of the current thread (or asyncio task), so that
+    concurrent generations are neither recorded nor disturbed.
+    """
+
+    enabled: bool = False
+    stats: dict[str, PathStats] = dataclasses.field(default_factory=dict)
+    _stack: _Stack = dataclasses.field(default_factory=_Stack, repr=False)
+    # The stats recorded into within `profile` and `capture` blocks.
+    _target: "contextvars.ContextVar[dict[str, PathStats] | None]" = dataclasses.field(
+        default_factory=lambda: contextvars.ContextVar("johen_profile_target", default=None),
+        repr=False,
+    )
+
+    def target(self) -> dict[str, PathStats] | None:
+        """
+        The stats that iterators generated now record into, None when not profiling.
+        """
+        stats = self._target.get()
+        if stats is None and self.enabled:
+            return self.stats
+        return stats
+
+    @contextlib.contextmanager
+    def profile(self) -> Iterator["GenerationProfiler"]:
+        token = self._target.set(self.stats)
+        try:
+            yield self
+        finally:
+            self._target.reset(token)
+
+    @contextlib.contextmanager
+    def capture(self) -> Iterator[dict[str, PathStats]]:
+        """
+        Profiles into a fresh set of stats, leaving those accumulated so far untouched.
+        """
+        stats: dict[str, PathStats] = {}
+        token = self._target.set(stats)
+        try:
+            yield stats
+        finally:
+            self._target.reset(token)
+
+    def wrap(
+        self,
+        path: tuple[str, ...],
+        iterator: Iterator[_A],
+        target: dict[str, PathStats] | None = None,
+    ) -> Iterator[_A]:
+        key = _address.sub("", " ".join(path))
+        frames = self._stack.frames
+        active = self._stack.active
+        target = self.stats if target is None else target
+
+        def wrapped() -> Iterator[_A]:
+            stats = target.setdefault(key, PathStats(depth=len(path) - 1))
+            while True:
+                session = gen.session
+                remaining = session.remaining_iterations
+                frames.append([0.0, 0])
+                active[key] = active.get(key, 0) + 1
+                started = time.perf_counter()
+                try:
+                    value = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds = time.perf_counter() - started
+                    draws = remaining - session.remaining_iterations
+                    child_seconds, child_draws = frames.pop()
+                    active[key] -= 1
+                    if not active[key]:
+                        stats.seconds += seconds
+                        stats.draws += draws
+                    stats.self_seconds += seconds - child_seconds
+                    stats.self_draws += draws - child_draws
+                    if frames:
+                        frames[-1][0] += seconds
+                        frames[-1][1] += draws
+                stats.values += 1
+                yield value
+
+        return wrapped()
+
+    def merge(self, stats: dict[str, dict[str, Any]]):
+        for key, path_stats in stats.items():
+            self.stats.setdefault(key, PathStats()).merge(PathStats(**path_stats))
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        return {k: dataclasses.asdict(v) for k, v in self.stats.items()}
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def slowest(self, limit: int = 10) -> list[tuple[str, PathStats]]:
+        return sorted(self.stats.items(), key=lambda kv: kv[1].self_seconds, reverse=True)[:limit]
+
+    def clear(self):
+        self.stats.clear()
+
+
+profiler = GenerationProfiler()
+
+
+def explain_exhaustion(
+    build: Callable[[], Iterator[Any]],
+    seed: int,
+    index: int,
+    max_iterations: int,
+    strategy: SeedStrategy = "chained",
+    prng: PRNG = "mersenne",
+    limit: int = 5,
+) -> str:
+    """
+    Replays the generation of the example at index under the profiler, describing the paths that drew the most
+    from its budget.  Only called once generation has failed, so that tracking draws costs nothing until then.
+    """
+    session = GenerationSession()
+    session.restart_at_index(seed, index, strategy, prng)
+    session.remaining_iterations = max_iterations
+    with profiler.capture() as stats, session:
+        try:
+            next(build(), None)
+        except Exception:
+            pass
+
+    used = max_iterations - max(session.remaining_iterations, 0)
+    lines = [f"used {used} of max_iterations={max_iterations} draws, top consumers:"]
+    for path, path_stats in sorted(stats.items(), key=lambda kv: kv[1].self_draws, reverse=True)[
+        :limit
+    ]:
+        lines.append(
+            f"  {path_stats.self_draws} draws ({path_stats.draws} including nested paths)"
+            f" at depth {path_stats.depth}: {path}"
+        )
+    return "\n".join(lines)
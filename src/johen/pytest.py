@@ -1,6 +1,11 @@
 import dataclasses
 import functools
 import inspect
+import itertools
+import pickle
+import sys
+import time
+import types
 import typing
 from collections import defaultdict
 from typing import Any
@@ -8,11 +13,13 @@ from typing import Any
 import pytest
 
 from johen.config import ParametrizeConfig, compile_matchers, pick_seed_from_name, updated_config
-from johen.exc import GenerationError
+from johen.corpus import CorpusCache, fingerprint
+from johen.exc import GenerationError, GenerationTimeout
 from johen.generators.annotations import AnnotationProcessingContext
 from johen.generators.base import generate_dicts_for_annotations
 from johen.globals import global_config
-from johen.random import gen
+from johen.profiler import explain_exhaustion, profiler
+from johen.random import PRNG, GenerationSession, SeedStrategy, gen
 
 _C = typing.TypeVar("_C", bound=typing.Callable)
 
@@ -22,6 +29,238 @@ except ImportError:
     from typing import Unpack
 
 
+@dataclasses.dataclass
+class GenerationStats:
+    """
+    The examples generated by `parametrize` in this process.  Under pytest-xdist each worker only generates the
+    cases scheduled on it, and reports its stats back to the controller, see `pytest_testnodedown`.
+    """
+
+    examples: int = 0
+    failures: int = 0
+    seconds: float = 0.0
+    # Examples loaded from the corpus cache rather than generated, see `--johen-cache`.
+    loaded: int = 0
+
+    def merge(self, other: dict[str, Any]):
+        self.examples += other.get("examples", 0)
+        self.loaded += other.get("loaded", 0)
+        self.failures += other.get("failures", 0)
+        self.seconds += other.get("seconds", 0.0)
+
+
+generation_stats = GenerationStats()
+
+
+@dataclasses.dataclass
+class _RandomAccessExamples:
+    """
+    Generates the example at any index on demand, by restarting a single generator tree at that index's seed
+    (see `johen.random.seed_for_index`) rather than generating every example before it.  Only the most recent
+    example is retained, so that the thunks of each argument of one case share a single generation.  A tree that
+    fails to produce an example is rebuilt for the next one, as its generators may have been exhausted.
+    """
+
+    build: typing.Callable[[], typing.Iterator[dict[str, Any]]]
+    session: GenerationSession = dataclasses.field(default_factory=GenerationSession)
+    tree: typing.Iterator[dict[str, Any]] | None = None
+    last: tuple[int, dict[str, Any] | None] | None = None
+    # Total time spent generating, see `max_test_seconds`.
+    seconds: float = 0.0
+
+    def at(
+        self,
+        index: int,
+        seed: int,
+        max_iterations: int,
+        strategy: SeedStrategy,
+        prng: PRNG,
+        seconds: float | None = None,
+    ) -> dict[str, Any] | None:
+        if self.last is not None and self.last[0] == index:
+            return self.last[1]
+
+        if self.tree is None:
+            self.tree = self.session.bind(self.build())
+        self.session.restart_at_index(seed, index, strategy, prng)
+        self.session.remaining_iterations = max_iterations
+        started = time.perf_counter()
+        if seconds is not None:
+            self.session.deadline = time.monotonic() + seconds
+        try:
+            example = next(self.tree, None)
+        except BaseException:
+            self.tree = None
+            generation_stats.failures += 1
+            raise
+        finally:
+            self.session.deadline = None
+            elapsed = time.perf_counter() - started
+            self.seconds += elapsed
+            generation_stats.seconds += elapsed
+            generation_stats.examples += 1
+        if example is None:
+            generation_stats.failures += 1
+            self.tree = None
+        self.last = (index, example)
+        return example
+
+
+@dataclasses.dataclass(eq=False)
+class _Cases:
+    """
+    The parametrized cases of one test.  Collection only creates a `_LazyCase` per index, see
+    `pytest_generate_tests`; its arguments are generated when `pytest_runtest_setup` resolves it.
+    """
+
+    test: typing.Callable
+    configs: list[ParametrizeConfig]
+    argspec: inspect.FullArgSpec
+    injected_args: list[str]
+    seed: int
+    count: int
+    examples: _RandomAccessExamples = dataclasses.field(init=False)
+    # Pickled examples loaded from, and newly generated for, the corpus cache.
+    corpus: dict[int, bytes] | None = None
+    generated: dict[int, bytes] = dataclasses.field(default_factory=dict)
+
+    def __post_init__(self):
+        self.examples = _RandomAccessExamples(self.build_call_args)
+
+    @functools.cached_property
+    def final_config(self) -> ParametrizeConfig:
+        return functools.reduce(updated_config, [global_config, *self.configs[1:]])
+
+    @functools.cached_property
+    def corpus_key(self) -> str | None:
+        # None when some matcher cannot be fingerprinted, its examples are then always generated.
+        final_config = self.final_config
+        return fingerprint(
+            f"{self.test.__module__}.{self.test.__qualname__}",
+            self.seed,
+            self.count,
+            final_config["seed_strategy"],
+            final_config["prng"],
+            final_config["max_iterations"],
+            final_config["generate_defaults"],
+            final_config["size"],
+            final_config["union_weights"],
+            self.annotations(),
+            final_config["matchers"],
+            final_config["type_matchers"],
+            sorted(final_config["globals"].items()),
+        )
+
+    def annotations(self) -> dict[str, Any]:
+        overrides = self.final_config["overrides"]
+        return {
+            k: overrides.get(k, self.argspec.annotations.get(k, Any)) for k in self.injected_args
+        }
+
+    def build_call_args(self) -> typing.Iterator[dict]:
+        final_config = self.final_config
+
+        if invalid_arg := next(
+            (k not in self.injected_args for k in final_config["overrides"].keys()), None
+        ):
+            raise ValueError(
+                f"Argument {invalid_arg} cannot be overriden, check your arg_set and overrides arguments to parametrize."
+            )
+
+        context = AnnotationProcessingContext.from_source(self.test)
+        context.generate_defaults = final_config["generate_defaults"]
+        context.matchers = compile_matchers(final_config)
+        context.globals = final_config["globals"]
+        context.size = final_config["size"]
+        context.union_weights = final_config["union_weights"]
+        return generate_dicts_for_annotations(self.annotations(), context, optional_keys=[])
+
+    def load(self, index: int) -> dict[str, Any] | None:
+        if corpus_cache is None or self.corpus_key is None:
+            return None
+        if self.corpus is None:
+            self.corpus = corpus_cache.load(self.corpus_key)
+        try:
+            call_args = pickle.loads(self.corpus[index])
+        except KeyError:
+            return None
+        except Exception:
+            # The pickle refers to something that no longer exists, regenerate it.
+            del self.corpus[index]
+            return None
+        generation_stats.loaded += 1
+        return call_args
+
+    def save(self, index: int, call_args: dict[str, Any]):
+        if corpus_cache is None or self.corpus_key is None:
+            return
+        try:
+            pickled = pickle.dumps(call_args, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Unpicklable examples are simply regenerated each session.
+            return
+        if not self.generated:
+            _cases_to_store.append(self)
+        self.generated[index] = pickled
+
+    def resolve(self, index: int) -> dict[str, Any]:
+        final_config = self.final_config
+        call_args = self.load(index)
+        if call_args is None:
+            budgets: list[float] = []
+            if final_config["max_example_seconds"] is not None:
+                budgets.append(final_config["max_example_seconds"])
+            if final_config["max_test_seconds"] is not None:
+                budgets.append(final_config["max_test_seconds"] - self.examples.seconds)
+            try:
+                call_args = self.examples.at(
+                    index,
+                    seed=self.seed,
+                    max_iterations=final_config["max_iterations"],
+                    strategy=final_config["seed_strategy"],
+                    prng=final_config["prng"],
+                    seconds=min(budgets, default=None),
+                )
+            except GenerationTimeout as e:
+                raise GenerationTimeout(
+                    f"{e} for test case {index} of {self.test.__name__}, see max_example_seconds and max_test_seconds.",
+                    e.path,
+                ) from None
+            if call_args is None:
+                explanation = explain_exhaustion(
+                    self.build_call_args,
+                    self.seed,
+                    index,
+                    final_config["max_iterations"],
+                    final_config["seed_strategy"],
+                    final_config["prng"],
+                )
+                raise GenerationError(
+                    f"Failed to generate test case {index} for {self.test.__name__}, check that constraint is not too strong.\n"
+                    + explanation
+                )
+            self.save(index, call_args)
+
+        # The test itself draws from the same seed its arguments were generated from.
+        gen.restart_at_index(self.seed, index, final_config["seed_strategy"], final_config["prng"])
+        gen.remaining_iterations = final_config["max_iterations"]
+        return call_args
+
+
+# Enabled by `--johen-cache`, see `pytest_configure`.
+corpus_cache: CorpusCache | None = None
+_cases_to_store: list[_Cases] = []
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class _LazyCase:
+    cases: _Cases
+    index: int
+
+    def __repr__(self) -> str:
+        return f"<case {self.index} of {self.cases.test.__name__}>"
+
+
 @dataclasses.dataclass
 class _parametrize:
     config: list[ParametrizeConfig] = dataclasses.field(default_factory=lambda: [global_config])
@@ -63,94 +302,236 @@ class _parametrize:
         count = gather_config["count"]
         assert count > 0, "count must be greater than 0"
 
-        @functools.cache
-        def get_call_args() -> typing.Iterator[dict]:
-            final_config: ParametrizeConfig = functools.reduce(
-                updated_config, [global_config, *configs[1:]]
-            )
+        cases = _Cases(
+            test=test,
+            configs=configs,
+            argspec=argspec,
+            injected_args=injected_args,
+            seed=final_seed,
+            count=count,
+        )
+        return pytest.mark.johen(count, injected_args, cases)(test)
 
-            if invalid_arg := next(
-                (k not in injected_args for k in final_config["overrides"].keys()), None
-            ):
-                raise ValueError(
-                    f"Argument {invalid_arg} cannot be overriden, check your arg_set and overrides arguments to parametrize."
-                )
 
-            context = AnnotationProcessingContext.from_source(test)
-            context.generate_defaults = final_config["generate_defaults"]
-            context.matchers = compile_matchers(final_config)
-            context.globals = final_config["globals"]
-            return gen.wrap_deterministically(
-                generate_dicts_for_annotations(
-                    {
-                        k: final_config["overrides"].get(k, argspec.annotations.get(k, Any))
-                        for k in injected_args
-                    },
-                    context,
-                    optional_keys=[],
-                ),
-                seed=final_seed,
-                max_iterations=final_config["max_iterations"],
-            )
+class JohenFunction(pytest.Function):
+    """
+    A case of a `parametrize`d test.  Rather than parametrizing via callspecs, which pytest resolves and reorders
+    per argument, its injected arguments are generated from its `_LazyCase` directly into its funcargs at setup.
+    """
+
+    def __init__(self, *args, case: _LazyCase, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.case = case
+
+
+def _is_builtin_plugin(plugin: Any) -> bool:
+    module = plugin.__name__ if isinstance(plugin, types.ModuleType) else type(plugin).__module__
+    return module == __name__ or module.startswith("_pytest.")
+
 
-        cached: list[dict[str, Any]] = []
-
-        def _get_arg_slice(arg: str) -> typing.Callable[[int], typing.Callable[[], Any]]:
-            def _get_arg_thunk(index: int):
-                def _thunk():
-                    call_args = get_call_args()
-                    while len(cached) < count:
-                        try:
-                            cached.append(next(call_args))
-                        except StopIteration as e:
-                            raise GenerationError(
-                                f"Failed to generate {count} test cases for {test.__name__}, check that constraint is not too strong."
-                            ) from e
-                    return cached[index][arg]
-
-                _thunk.__name__ = f"{arg}-{index}"
-                return _thunk
-
-            return _get_arg_thunk
-
-        return pytest.mark.johen(count, injected_args)(
-            pytest.mark.parametrize(
-                injected_args,
-                [
-                    [_get_arg_slice(k)(i) for k in injected_args]
-                    for i in range(gather_config["count"])
-                ],
-                indirect=(),
-            )(test)
+@pytest.hookimpl(tryfirst=True)
+def pytest_pycollect_makeitem(collector: pytest.Collector, name: str, obj: Any):
+    marks = getattr(obj, "pytestmark", ())
+    cases: _Cases | None = next(
+        (m.args[2] for m in marks if m.name == "johen" and len(m.args) > 2), None
+    )
+    if cases is None or not isinstance(collector, pytest.Class | pytest.Module):
+        return None
+    if not collector.istestfunction(obj, name):
+        return None
+
+    # The cases share the fixture resolution of the test, which is only valid when nothing else parametrizes it.
+    # Otherwise, fall back to parametrizing in `pytest_generate_tests`.
+    probe = pytest.Function.from_parent(collector, name=name)
+    fixtureinfo = probe._fixtureinfo
+    if (
+        any(probe.iter_markers("parametrize"))
+        or any(defs[-1].params is not None for defs in fixtureinfo.name2fixturedefs.values())
+        or not all(
+            _is_builtin_plugin(impl.plugin)
+            for impl in collector.ihook.pytest_generate_tests.get_hookimpls()
+        )
+        or any(
+            hasattr(parent.obj, "pytest_generate_tests")
+            for parent in (collector.getparent(pytest.Module), collector.getparent(pytest.Class))
+            if parent is not None
+        )
+    ):
+        return None
+
+    return [
+        JohenFunction.from_parent(
+            collector,
+            name=f"{name}[{i}]",
+            originalname=name,
+            fixtureinfo=fixtureinfo,
+            case=_LazyCase(cases, i),
         )
+        for i in range(cases.count)
+    ]
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc):
+    mark = metafunc.definition.get_closest_marker("johen")
+    if mark is None or len(mark.args) < 3:
+        return
+
+    cases: _Cases = mark.args[2]
+    # Every injected argument of a case shares the same lazy value, and its id is just the index.
+    metafunc.parametrize(
+        cases.injected_args,
+        [
+            pytest.param(
+                *itertools.repeat(_LazyCase(cases, i), len(cases.injected_args)), id=str(i)
+            )
+            for i in range(cases.count)
+        ],
+    )
+
+
+def pytest_addoption(parser: pytest.Parser):
+    group = parser.getgroup("johen")
+    group.addoption(
+        "--johen-cache",
+        action="store_true",
+        default=None,
+        help="Load parametrized examples from, and store them into, a corpus under the pytest cache directory.",
+    )
+    group.addoption(
+        "--johen-cache-clear",
+        action="store_true",
+        default=False,
+        help="Remove all examples from the johen corpus cache at the start of the session.",
+    )
+    group.addoption(
+        "--johen-profile",
+        action="store_true",
+        default=False,
+        help="Profile generation by annotation path, and report the slowest paths.",
+    )
+    group.addoption(
+        "--johen-profile-json",
+        default=None,
+        metavar="PATH",
+        help="Profile generation by annotation path, and dump the results as JSON to PATH.",
+    )
+    parser.addini(
+        "johen_cache", type="bool", default=False, help="Enable the johen corpus cache by default."
+    )
+    parser.addini(
+        "johen_profile_limit",
+        default="10",
+        help="The number of paths reported by --johen-profile.",
+    )
+    parser.addini(
+        "johen_cache_max_bytes",
+        default=str(64 * 1024 * 1024),
+        help="The size beyond which the least recently used corpora are evicted.",
+    )
 
 
 def pytest_configure(config: pytest.Config):
+    global corpus_cache
+
     config.addinivalue_line(
         "markers", "johen(injected): marks a test for parametrization via the johen.pytest hooks."
     )
 
+    if config.getoption("johen_profile") or config.getoption("johen_profile_json"):
+        profiler.enabled = True
+
+    cache = getattr(config, "cache", None)
+    if cache is None:
+        return
+    enabled = config.getoption("johen_cache")
+    if enabled is None:
+        enabled = config.getini("johen_cache")
+    # Under xdist, only the controller clears the cache, before any worker starts.
+    clear = config.getoption("johen_cache_clear") and not hasattr(config, "workerinput")
+    if not (enabled or clear):
+        return
+
+    directory = cache.mkdir("johen")
+    max_bytes = int(config.getini("johen_cache_max_bytes"))
+    if clear:
+        CorpusCache(directory, max_bytes).clear()
+    if enabled:
+        corpus_cache = CorpusCache(directory, max_bytes)
+
+
+def pytest_unconfigure(config: pytest.Config):
+    global corpus_cache
+    corpus_cache = None
+
+    json_path = config.getoption("johen_profile_json")
+    if json_path and not hasattr(config, "workerinput"):
+        profiler.dump(json_path)
+    profiler.enabled = False
+
+
+def pytest_sessionfinish(session: pytest.Session):
+    if corpus_cache is not None:
+        for cases in _cases_to_store:
+            if cases.corpus_key is not None:
+                corpus_cache.store(cases.corpus_key, cases.generated)
+            cases.generated.clear()
+    _cases_to_store.clear()
+
+    workeroutput = getattr(session.config, "workeroutput", None)
+    if workeroutput is not None:
+        workeroutput["johen_generation_stats"] = dataclasses.asdict(generation_stats)
+        if profiler.enabled:
+            workeroutput["johen_profile"] = profiler.as_dict()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node: Any, error: Any):
+    # pytest-xdist controller: gather the stats of each worker as it finishes.
+    workeroutput = getattr(node, "workeroutput", {})
+    generation_stats.merge(workeroutput.get("johen_generation_stats", {}))
+    profiler.merge(workeroutput.get("johen_profile", {}))
+
+
+def pytest_terminal_summary(terminalreporter: Any):
+    if (
+        generation_stats.examples or generation_stats.loaded
+    ) and terminalreporter.config.option.verbose >= 0:
+        terminalreporter.write_line(
+            f"johen: generated {generation_stats.examples} examples in {generation_stats.seconds:.2f}s"
+            f" ({generation_stats.failures} failed, {generation_stats.loaded} loaded from cache)"
+        )
+
+    if profiler.enabled and profiler.stats:
+        terminalreporter.write_sep("=", "johen slowest generation paths")
+        terminalreporter.write_line(
+            f"{'self s':>9} {'total s':>9} {'values':>8} {'self draws':>10}  path"
+        )
+        for path, stats in profiler.slowest(
+            int(terminalreporter.config.getini("johen_profile_limit"))
+        ):
+            terminalreporter.write_line(
+                f"{stats.self_seconds:9.4f} {stats.seconds:9.4f} {stats.values:8d} {stats.self_draws:10d}  {path}"
+            )
+
 
 _default = object()
 
 
 @dataclasses.dataclass
 class Sometimes:
-    calls: dict[tuple[str, int], tuple[set[int], set[int]]] = dataclasses.field(
-        default_factory=lambda: defaultdict(lambda: (set(), set()))
+    """
+    Records, per call site, which examples of the current test hit or missed a condition.  Call sites are
+    identified by their code object and line, and hits and misses are bitsets indexed by `gen.index`.
+    """
+
+    calls: dict[tuple[types.CodeType, int], list[int]] = dataclasses.field(
+        default_factory=lambda: defaultdict(lambda: [0, 0])
     )
 
     def __call__(self, cond: Any) -> bool:
-        result = bool(cond)
-        frameinfo = inspect.getouterframes(inspect.currentframe())[1]
-
-        hits, misses = self.calls[(frameinfo.filename, frameinfo.lineno)]
-
-        if not result:
-            misses.add(gen.last_seed)
-            return True
-
-        hits.add(gen.last_seed)
+        frame = sys._getframe(1)
+        bits = self.calls[(frame.f_code, frame.f_lineno)]
+        bits[0 if cond else 1] |= 1 << gen.index
         return True
 
 
@@ -163,16 +544,27 @@ def pytest_runtest_setup(item: pytest.Item):
     mark = item.get_closest_marker("johen")
     if mark is None:
         # In this case, at the very least, reset the seed deterministically for raw `generate` calls.
-        gen.restart_at(pick_seed_from_name(item.name))
+        gen.restart_at_index(
+            pick_seed_from_name(item.name),
+            0,
+            global_config["seed_strategy"],
+            global_config["prng"],
+        )
         yield
         return
 
     injected: list[str] = mark.args[1]
 
-    if hasattr(item, "callspec"):
+    if isinstance(item, JohenFunction):
+        call_args = item.case.cases.resolve(item.case.index)
         for k in injected:
-            # apply the thunk.
-            item.callspec.params[k] = item.callspec.params[k]()  # type: ignore
+            item.funcargs[k] = call_args[k]
+    elif hasattr(item, "callspec"):
+        case = item.callspec.params[injected[0]]
+        if isinstance(case, _LazyCase):
+            call_args = case.cases.resolve(case.index)
+            for k in injected:
+                item.callspec.params[k] = call_args[k]
     else:
         raise GenerationError(
             f"Test {item.name!r} does not support parametrization, you will need to invoke `generate` directly."
@@ -212,8 +604,9 @@ def check_sometimes_misses(request: pytest.FixtureRequest):
         return
 
     failure_lines = []
-    for (filename, lineno), (hits, misses) in sometimes.calls.items():
-        if len(hits) == marker.args[0]:
+    for (code, lineno), (hits, misses) in sometimes.calls.items():
+        filename = code.co_filename
+        if hits.bit_count() == marker.args[0]:
             failure_lines.append(
                 f"{filename}:{lineno} -- all tests hit, try increasing count to find counterfactuals"
             )
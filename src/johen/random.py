@@ -1,23 +1,179 @@
+import contextvars
 import dataclasses
+import functools
 import random
+import threading
+import time
+import types
 import typing
-from typing import Iterator
+from typing import Iterator, Literal
+
+from johen.exc import GenerationTimeout
 
 _A = typing.TypeVar("_A")
 
 
-__all__ = ["gen"]
+__all__ = [
+    "gen",
+    "GenerationSession",
+    "SeedStrategy",
+    "seed_for_index",
+    "PRNG",
+    "SplitMixRandom",
+    "AliasTable",
+]
 
+# How the seed of each top level example is derived from the seed of a generation.
+# "chained": each seed is drawn from a Random seeded with the previous one, the original (and default) strategy.
+# "indexed": each seed is a pure function of the root seed and the example's index, allowing random access.
+SeedStrategy = Literal["chained", "indexed"]
 
-@dataclasses.dataclass
-class _RandomGenerator:
+# The pseudo random number generator backing each `gen.r`.
+# "mersenne": python's default `random.Random`.  Draws are fast, but (re)seeding initializes ~2.5KB of state.
+# "splitmix64": `SplitMixRandom`, with O(1) seeding but slower draws, suited to large counts of small examples.
+PRNG = Literal["mersenne", "splitmix64"]
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+def _splitmix64(z: int) -> int:
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9 & _MASK64
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EB & _MASK64
+    return z ^ (z >> 31)
+
+
+@dataclasses.dataclass(frozen=True)
+class AliasTable:
+    """
+    Vose's alias method: picks index i with probability `weights[i] / sum(weights)` from a single `random()` draw,
+    in O(1) regardless of the number of weights.
     """
-    A global, nearly-never ending generator for producing Random instances to other random source generators.
-    Allows its generation to be seeded, ensuring that consumers of this iterator will behave deterministically
-    given that they draw all their source of random variables from this iterator.
 
-    Use the `gen` variable directly to construct such sources of generative data:
-    my_integers = (r.randint(0, 100) for r in gen)
+    size: int
+    # One column per weight, plus a trailing column that never picks itself, for when `random() * size` rounds up
+    # to size.
+    probabilities: tuple[float, ...]
+    aliases: tuple[int, ...]
+
+    @classmethod
+    def from_weights(cls, weights: typing.Sequence[float]) -> "AliasTable":
+        total = sum(weights)
+        if not weights or any(w < 0 for w in weights) or not total > 0:
+            raise ValueError(f"Weights must be non negative, with a positive sum, got {weights}")
+
+        n = len(weights)
+        scaled = [w * n / total for w in weights]
+        probabilities = [1.0] * n
+        aliases = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            under, over = small.pop(), large.pop()
+            probabilities[under] = scaled[under]
+            aliases[under] = over
+            scaled[over] -= 1.0 - scaled[under]
+            (small if scaled[over] < 1.0 else large).append(over)
+        # Whatever remains is 1 up to rounding error.
+        return cls(
+            n, (*probabilities, 0.0), (*aliases, aliases[-1] if probabilities[-1] < 1.0 else n - 1)
+        )
+
+    def pick(self, r: random.Random) -> int:
+        u = r.random() * self.size
+        i = int(u)
+        return i if u - i < self.probabilities[i] else self.aliases[i]
+
+
+class SplitMixRandom(random.Random):
+    """
+    A `random.Random` whose only state is the 64 bit counter of splitmix64, all other methods (randint, choice,
+    sample, ...) are derived from `getrandbits` and `random` as usual.
+    """
+
+    _state: int = 0
+
+    def seed(self, a: typing.Any = None, version: int = 2) -> None:
+        if a is None:
+            a = random.getrandbits(64)
+        elif not isinstance(a, int):
+            a = hash(a)
+        self._state = a & _MASK64
+        self.gauss_next = None
+
+    def _next64(self) -> int:
+        self._state = state = (self._state + _GOLDEN_GAMMA) & _MASK64
+        return _splitmix64(state)
+
+    def getrandbits(self, k: int) -> int:
+        if k < 0:
+            raise ValueError("number of bits must be non-negative")
+        if k <= 64:
+            return self._next64() >> (64 - k)
+        result = 0
+        for _ in range((k + 63) // 64):
+            result = (result << 64) | self._next64()
+        return result >> (-k % 64)
+
+    def random(self) -> float:
+        return (self._next64() >> 11) * (1.0 / 9007199254740992.0)
+
+    def getstate(self) -> typing.Any:
+        return self._state, self.gauss_next
+
+    def setstate(self, state: typing.Any) -> None:
+        self._state, self.gauss_next = state
+
+
+class _Scratch(threading.local):
+    def __init__(self):
+        self.instances: dict[PRNG, random.Random] = {
+            "mersenne": random.Random(0),
+            "splitmix64": SplitMixRandom(0),
+        }
+
+
+_scratch = _Scratch()
+
+
+def _new_random(seed: int, prng: PRNG) -> random.Random:
+    if prng == "splitmix64":
+        return SplitMixRandom(seed)
+    return random.Random(seed)
+
+
+@functools.lru_cache(maxsize=4096)
+def _next_chained_seed(seed: int, prng: PRNG = "mersenne") -> int:
+    # Reseeds a scratch instance in place, rather than allocating a Random only to draw 64 bits from it.
+    scratch = _scratch.instances[prng]
+    scratch.seed(seed)
+    return scratch.getrandbits(64)
+
+
+def seed_for_index(
+    seed: int, index: int, strategy: SeedStrategy = "chained", prng: PRNG = "mersenne"
+) -> int:
+    """
+    The seed that the example at `index` is generated from, given the root `seed`.  The first example always
+    uses the root seed itself.  With the "indexed" strategy this is O(1), the "chained" strategy needs to walk
+    the chain from the root, but never generates any of the examples in between.
+    """
+    if index == 0:
+        return seed
+    if strategy == "indexed":
+        return _splitmix64((seed + index * _GOLDEN_GAMMA) & _MASK64)
+    for _ in range(index):
+        seed = _next_chained_seed(seed, prng)
+    return seed
+
+
+@dataclasses.dataclass
+class GenerationSession:
+    """
+    The state behind `gen`: the current Random, its seed, and the remaining iteration budget.  The session in use
+    is held by a context variable, so each thread (and asyncio task that binds one) generates independently.
+    `bind` runs an iterator within a session no matter who consumes it, which is how `wrap_deterministically`
+    and `generate` keep concurrent generations from interfering with each other's determinism or budget.
     """
 
     last_seed: int = 0
@@ -26,55 +182,289 @@ class _RandomGenerator:
     remaining_iterations: int = (
         -1
     )  # Reset this before generating each parameter at the top of a process.
+    # The root seed and index of the current top level example, see `seed_for_index`.
+    root_seed: int = 0
+    index: int = 0
+    seed_strategy: SeedStrategy = "chained"
+    prng: PRNG = "mersenne"
+    # The `time.monotonic` after which drawing raises a `GenerationTimeout`, see `max_example_seconds`.
+    deadline: float | None = None
+    # The nodes left to the value being generated, within a recursive value, see `ParametrizeConfig.size`.
+    size: int | None = None
+    # Values drawn ahead by buffering sources, see `johen.generators.vectorized`.  Dropped whenever the session is
+    # reseeded, so that buffered values only depend on the example being generated.
+    buffers: dict[typing.Any, typing.Any] = dataclasses.field(default_factory=dict, repr=False)
+    # The path of the innermost annotation being generated, see `at_path`.
+    path: tuple[str, ...] = ()
+    _tokens: list[contextvars.Token] = dataclasses.field(default_factory=list, repr=False)
 
     def restart_at(self, seed: int):
         self.last_seed = seed
-        self.r = random.Random(seed)
+        self.r = _new_random(seed, self.prng)
+        self.root_seed = seed
+        self.index = 0
+        self.buffers.clear()
+
+    def restart_at_index(
+        self,
+        seed: int,
+        index: int,
+        strategy: SeedStrategy | None = None,
+        prng: PRNG | None = None,
+        index_seed: int | None = None,
+    ):
+        """
+        Restarts generation at the example `index` for the given root seed, without generating those before it.
+        `index_seed` is the seed of that example, when already known from `seed_for_index`.
+        """
+        if strategy is not None:
+            self.seed_strategy = strategy
+        if prng is not None:
+            self.prng = prng
+        if index_seed is None:
+            index_seed = seed_for_index(seed, index, self.seed_strategy, self.prng)
+        self.last_seed = index_seed
+        self.r = _new_random(self.last_seed, self.prng)
+        self.root_seed = seed
+        self.index = index
+        self.buffers.clear()
+
+    def restart_at_next_seed(self):
+        if self.seed_strategy == "chained":
+            root_seed, index = self.root_seed, self.index
+            self.restart_at(_next_chained_seed(self.last_seed, self.prng))
+            self.root_seed, self.index = root_seed, index + 1
+        else:
+            self.restart_at_index(self.root_seed, self.index + 1)
+        return self
+
+    def bind(self, iterator: Iterator[_A]) -> Iterator[_A]:
+        """
+        Wraps iterator so that each of its steps draws from this session.
+        """
+
+        def bound():
+            while True:
+                token = _current_session.set(self)
+                try:
+                    rv = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    _current_session.reset(token)
+                yield rv
+
+        return bound()
+
+    def timed(self, iterator: Iterator[_A], seconds: float) -> Iterator[_A]:
+        """
+        Wraps iterator so that each of its values must be generated within seconds, or raise a
+        `GenerationTimeout`.
+        """
+
+        def timed():
+            while True:
+                deadline = self.deadline
+                self.deadline = time.monotonic() + seconds
+                try:
+                    rv = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.deadline = deadline
+                yield rv
+
+        return timed()
+
+    def __enter__(self) -> "GenerationSession":
+        self._tokens.append(_current_session.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_session.reset(self._tokens.pop())
+
+
+_current_session: contextvars.ContextVar[GenerationSession] = contextvars.ContextVar(
+    "johen_session"
+)
+
+
+class _RandomGenerator:
+    """
+    A global, nearly-never ending generator for producing Random instances to other random source generators.
+    Allows its generation to be seeded, ensuring that consumers of this iterator will behave deterministically
+    given that they draw all their source of random variables from this iterator.
+
+    Use the `gen` variable directly to construct such sources of generative data:
+    my_integers = map(lambda r: r.randint(0, 100), gen)
+
+    Prefer `map`, `filter` and `zip` to generator expressions for module level sources: generator objects cannot
+    be advanced by two threads at once, while these can.  The state of `gen` is that of the current
+    `GenerationSession`.
+    """
+
+    @property
+    def session(self) -> GenerationSession:
+        try:
+            return _current_session.get()
+        except LookupError:
+            session = GenerationSession()
+            _current_session.set(session)
+            return session
+
+    @property
+    def last_seed(self) -> int:
+        return self.session.last_seed
+
+    @property
+    def r(self) -> random.Random:
+        return self.session.r
+
+    @property
+    def remaining_iterations(self) -> int:
+        return self.session.remaining_iterations
+
+    @remaining_iterations.setter
+    def remaining_iterations(self, value: int):
+        self.session.remaining_iterations = value
+
+    @property
+    def root_seed(self) -> int:
+        return self.session.root_seed
+
+    @property
+    def index(self) -> int:
+        return self.session.index
+
+    @property
+    def seed_strategy(self) -> SeedStrategy:
+        return self.session.seed_strategy
+
+    @property
+    def prng(self) -> PRNG:
+        return self.session.prng
+
+    def restart_at(self, seed: int):
+        self.session.restart_at(seed)
+
+    def restart_at_index(
+        self,
+        seed: int,
+        index: int,
+        strategy: SeedStrategy | None = None,
+        prng: PRNG | None = None,
+        index_seed: int | None = None,
+    ):
+        self.session.restart_at_index(seed, index, strategy, prng, index_seed)
+
+    def restart_at_next_seed(self):
+        self.session.restart_at_next_seed()
+        return self
 
     def wrap_deterministically(
-        self, iter: Iterator[_A], seed: int, max_iterations: int
+        self,
+        iter: Iterator[_A],
+        seed: int,
+        max_iterations: int,
+        start: int = 0,
+        strategy: SeedStrategy | None = None,
+        prng: PRNG | None = None,
+        max_example_seconds: float | None = None,
+        start_seed: int | None = None,
     ) -> Iterator[_A]:
         """
-        Enforces deterministic seed resolution, and a max_iterations per top level yield.
+        Enforces deterministic seed resolution, and a max_iterations (and optionally max_example_seconds) per top
+        level yield.  `start` skips directly to the example at that index, which requires that `iter` draws all
+        its randomness from `gen`; `start_seed` is the seed of that example, when already known.  The result is
+        bound to its own `GenerationSession`.
         """
+        session = GenerationSession(seed_strategy=strategy or "chained", prng=prng or "mersenne")
+
+        def reset_budget():
+            session.remaining_iterations = max_iterations
+            if max_example_seconds is not None:
+                session.deadline = time.monotonic() + max_example_seconds
 
         def wrapped():
-            self.restart_at(seed)
-            self.remaining_iterations = max_iterations
-            for rv in iter:
+            session.restart_at_index(seed, start, index_seed=start_seed)
+            reset_budget()
+            for rv in session.bind(iter):
                 yield rv
-                self.restart_at_next_seed()
-                self.remaining_iterations = max_iterations
+                session.restart_at_next_seed()
+                reset_budget()
 
         return wrapped()
 
-    def restart_at_next_seed(self):
-        self.restart_at(self.last_seed)
-        next_seed = self.r.getrandbits(64)
-        self.restart_at(next_seed)
-        return self
-
     def __next__(self) -> "random.Random":
-        if self.remaining_iterations <= 0:
+        try:
+            session = _current_session.get()
+        except LookupError:
+            session = self.session
+        if session.remaining_iterations <= 0:
             raise StopIteration("Could not find generation")
-        self.remaining_iterations -= 1
-        return self.r
+        session.remaining_iterations -= 1
+        if session.deadline is not None and time.monotonic() > session.deadline:
+            session.deadline = None
+            path = session.path
+            raise GenerationTimeout(
+                f"Ran out of time generating example {session.index} at {' '.join(path) or 'unknown path'}",
+                path,
+            )
+        return session.r
 
     def __iter__(self) -> "Iterator[random.Random]":
         return self
 
+    @staticmethod
+    def at_path(path: tuple[str, ...], iterator: Iterator[_A]) -> Iterator[_A]:
+        """
+        Wraps iterator so that the current session records path as the one being generated while it is advanced,
+        which `GenerationTimeout`s report.
+        """
+
+        def tracked():
+            sessions = _current_session
+            while True:
+                session = sessions.get(None) or gen.session
+                outer, session.path = session.path, path
+                try:
+                    rv = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    session.path = outer
+                yield rv
+
+        return tracked()
+
     @staticmethod
     def one_of(*options: typing.Iterable[_A]) -> Iterator[_A]:
-        composed_options: list[typing.Iterable[_A]] = [
+        """
+        Picks uniformly among options for each value.  Finite iterables (such as lists) are themselves picked from
+        uniformly, other iterators are advanced.
+        """
+        composed_options: list[typing.Iterator[_A]] = [
             _RandomGenerator._normalize(i) for i in options
         ]
-        return (next(iter(r.choice(composed_options))) for r in gen)
+        return map(lambda r: next(r.choice(composed_options)), gen)
+
+    @staticmethod
+    def frequency(*options: tuple[float, typing.Iterable[_A]]) -> Iterator[_A]:
+        """
+        Like `one_of`, but picks each option with probability proportional to its weight, in O(1) per value from an
+        `AliasTable`, eg `gen.frequency((9, ints), (1, [None]))`.
+        """
+        table = AliasTable.from_weights([w for w, _ in options])
+        composed_options: list[typing.Iterator[_A]] = [
+            _RandomGenerator._normalize(i) for _, i in options
+        ]
+        return map(lambda r: next(composed_options[table.pick(r)]), gen)
 
     @staticmethod
     def _normalize(i: typing.Iterable[_A]) -> typing.Iterator[_A]:
         if not hasattr(i, "__next__"):
-            i = list(i)
-            return (r.choice(i) for r in gen)
+            items = list(i)
+            return map(lambda r: r.choice(items), gen)
         return iter(i)
 
 
@@ -1,26 +1,77 @@
+import array
+import collections
+import concurrent.futures
+import csv
 import dataclasses
+import datetime
 import enum
+import io
+import itertools
+import json
+import math
 import random
 import sys
+import threading
+import time
 import typing
+import unittest.mock
+import uuid
 from random import Random
+from typing import Annotated, Any, Iterator
 
+import annotated_types as at
+import pydantic
 import pytest
 import typing_extensions
 
-from johen import gen, generate, global_config
+import johen.random
+from johen import (
+    gen,
+    generate,
+    generate_batch,
+    generate_columns,
+    global_config,
+    replace_global_config,
+)
 from johen.config import compile_matchers
+from johen.corpus import CorpusCache, fingerprint
 from johen.examples import Examples
-from johen.exc import GenerationError
-from johen.generators.annotations import AnnotationProcessingContext
+from johen.exc import GenerationError, GenerationTimeout
+from johen.generators.annotations import (
+    AnnotationProcessingContext,
+    GenerationPlan,
+    GenerationPlans,
+    MatcherRegistry,
+    evict_lru,
+    generation_plans,
+)
 from johen.generators.base import (
     FullArgSpec,
+    generate_annotated,
     generate_call_args_for_argspec,
+    generate_dicts,
     generate_dicts_for_annotations,
+    generate_enums,
+    generate_forward_refs,
+    generate_lists_sets_frozen_sets,
+    generate_literals,
+    generate_named_tuples,
+    generate_results_from_call,
     generate_tuples,
+    generate_unions,
+    invalidate_model_schema,
+    resolve_forward_ref,
 )
-from johen.generators.specialized import JsonDict, JsonValue, SimpleSymbol, ints
-from johen.pytest import parametrize, sometimes
+from johen.generators.constraints import Constraints
+from johen.generators.pydantic import generate_pydantic_instances
+from johen.generators.specialized import JsonDict, JsonValue, SimpleSymbol, ints, unsigned_ints
+from johen.globals import generation_context
+from johen.parallel import ShardReport, generate_parallel
+from johen.profiler import GenerationProfiler, explain_exhaustion, profiler
+from johen.pytest import JohenFunction, Sometimes, _RandomAccessExamples, parametrize, sometimes
+from johen.random import AliasTable, GenerationSession, SplitMixRandom
+
+pytest_plugins = ["pytester"]
 
 
 @parametrize
@@ -370,3 +421,910 @@ def test_stable(val: int):
     assert sometimes(val == 24586)
     assert sometimes(val == 4)
     assert sometimes(val == 10478)
+
+
+def test_generation_plans_follow_config_changes():
+    class Custom:
+        pass
+
+    with pytest.raises(GenerationError):
+        generate(Custom)
+
+    customs = (Custom() for _ in gen)
+    with replace_global_config(
+        {**global_config, "type_matchers": {**global_config["type_matchers"], Custom: customs}}
+    ):
+        for _ in range(2):
+            hits = generation_plans.hits
+            assert isinstance(next(generate(Custom)), Custom)
+        assert generation_plans.hits > hits
+
+    with pytest.raises(GenerationError):
+        generate(Custom)
+
+
+def test_generation_plans_record_sub_plans():
+    @dataclasses.dataclass
+    class Inner:
+        a: int
+
+    @dataclasses.dataclass
+    class Outer:
+        inner: Inner
+        items: list[Inner]
+
+    context = generation_context(Outer)
+    assert context.plan() is not None
+    # Resolving a plan does not generate, nor resolve, the annotations it steps into.
+    assert generation_plans.get(generation_context(Inner).plan_key) is None
+
+    next(generate(Outer))
+    assert generation_plans.entries[context.plan_key].children
+    hits = generation_plans.hits
+    next(generate(Outer))
+    # Only the root is looked up, stepped annotations reuse the sub-plans recorded under it.
+    assert generation_plans.hits == hits + 1
+
+    # Steps whose args are built afresh each time share their sub-plan.
+    def call(a: int, *args: str, **kw: bool):
+        pass
+
+    for source, matchers in ((tuple[int, ...], None), (call, [generate_results_from_call])):
+        for _ in range(20):
+            next(generate(source, matchers=matchers))
+        plan_key = generation_context(source, matchers=matchers).plan_key
+        assert len(generation_plans.entries[plan_key].children) <= 3
+
+
+def test_matcher_registry_dispatch():
+    def user_matcher(context: AnnotationProcessingContext):
+        return None
+
+    matchers = [user_matcher, *compile_matchers(global_config)]
+    registry = MatcherRegistry(tuple(matchers))
+
+    for source, expected, unexpected in [
+        (list[int], generate_lists_sets_frozen_sets, generate_dicts),
+        (typing.Mapping[str, int], generate_dicts, generate_lists_sets_frozen_sets),
+        (TestEnum, generate_enums, generate_tuples),
+        (FullArgSpec, generate_named_tuples, generate_enums),
+        (typing.ForwardRef("JsonValue"), generate_forward_refs, generate_literals),
+        (int | None, generate_unions, generate_annotated),
+    ]:
+        context = AnnotationProcessingContext.from_source(source)
+        candidates = registry.candidates(context)
+        assert candidates[0] is user_matcher
+        assert expected in candidates
+        assert unexpected not in candidates
+        assert list(candidates) == [m for m in matchers if m in candidates]
+
+
+def test_model_schemas_are_cached_until_invalidated():
+    @dataclasses.dataclass
+    class Model:
+        a: int
+
+    assert isinstance(next(generate(Model)).a, int)
+    Model.__annotations__["a"] = str
+    assert isinstance(next(generate(Model)).a, int)
+
+    invalidate_model_schema(Model)
+    assert isinstance(next(generate(Model)).a, str)
+
+
+@parametrize(count=5)
+def test_random_access_seeding(seed: int, strategy: typing.Literal["chained", "indexed"]):
+    def values(start: int) -> list[typing.Any]:
+        iterator = gen.wrap_deterministically(
+            generate(tuple[FullArgSpec, dict[str, list[float]]]),
+            seed=seed,
+            max_iterations=10000,
+            start=start,
+            strategy=strategy,
+        )
+        return [v for _, v in zip(range(6 - start), iterator)]
+
+    ambient_seed = gen.last_seed
+    sequential = values(0)
+    assert sequential[0] != sequential[1] or sequential[1] != sequential[2]
+    for start in range(1, 6):
+        assert values(start) == sequential[start:]
+    assert gen.last_seed == ambient_seed
+
+
+@parametrize(seed_strategy="indexed")
+def test_indexed_seed_strategy(val: int):
+    assert gen.seed_strategy == "indexed"
+    assert sometimes(val == 0)
+    assert sometimes(val != 0)
+
+
+@parametrize(prng="splitmix64", count=20)
+def test_splitmix64_prng(val: int, r: Random, seed: int):
+    assert isinstance(gen.r, SplitMixRandom)
+    assert sometimes(val == 0)
+    assert sometimes(val < 0)
+
+    a, b = SplitMixRandom(seed), SplitMixRandom(seed)
+    assert [a.getrandbits(130) for _ in range(3)] == [b.getrandbits(130) for _ in range(3)]
+    assert 0 <= a.getrandbits(130) < 2**130
+    assert sometimes(a.getrandbits(130) >= 2**129)
+    assert 0 <= r.random() < 1
+    assert r.randint(-3, 3) in range(-3, 4)
+
+
+def test_concurrent_generation_is_deterministic():
+    model = tuple[FullArgSpec, dict[str, list[float]]]
+
+    def run(seed: int) -> list:
+        return list(generate(model, seed=seed, count=20))
+
+    def interleaved(seed: int) -> Iterator:
+        return gen.wrap_deterministically(generate(model), seed=seed, max_iterations=10000)
+
+    serial = [run(seed) for seed in range(8)]
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            assert list(pool.map(run, range(8))) == serial
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    a, b = interleaved(0), interleaved(1)
+    assert [v for _, pair in zip(range(20), zip(a, b)) for v in pair] == [
+        v
+        for pair in zip(*(list(itertools.islice(interleaved(seed), 20)) for seed in (0, 1)))
+        for v in pair
+    ]
+
+
+def test_lru_caches_tolerate_concurrent_eviction():
+    class Racing(collections.OrderedDict):
+        def move_to_end(self, key, last=True):
+            # Another thread evicts the entry between its lookup and its move.
+            self.clear()
+            super().move_to_end(key, last)
+
+    plans = GenerationPlans(maxsize=1)
+    plans.entries = Racing()
+    plans.put(int, GenerationPlan(lambda context: None))
+    assert plans.get(int) is None and plans.misses == 1
+
+    entries = collections.OrderedDict.fromkeys(range(3))
+    evict_lru(entries, 1)
+    assert list(entries) == [2]
+    evict_lru(collections.OrderedDict(), -1)
+
+
+def test_generate_parallel_matches_serial_order():
+    model = tuple[FullArgSpec, dict[str, list[float]]]
+    serial = [
+        v
+        for _, v in zip(
+            range(30),
+            gen.wrap_deterministically(generate(model), seed=7, max_iterations=10000),
+        )
+    ]
+
+    reports: list[ShardReport] = []
+    assert generate_parallel(model, 30, workers=1, seed=7) == serial
+    assert (
+        generate_parallel(model, 30, workers=2, seed=7, shard_size=4, on_shard=reports.append)
+        == serial
+    )
+    assert [(r.start, r.stop) for r in reports] == [(i, min(i + 4, 30)) for i in range(0, 30, 4)]
+    assert all(r.examples_per_second > 0 for r in reports)
+
+    # Chained seeds are walked once across shards, rather than from the root seed for each shard.
+    steps = 0
+    next_chained_seed = johen.random._next_chained_seed
+
+    def counting(seed: int, prng: typing.Any) -> int:
+        nonlocal steps
+        steps += 1
+        return next_chained_seed(seed, prng)
+
+    with unittest.mock.patch("johen.random._next_chained_seed", counting):
+        assert generate_parallel(model, 30, workers=1, seed=7, shard_size=3) == serial
+    assert steps < 60
+
+    def unpicklable(i: int) -> typing.Callable[[], int]:
+        return lambda: i
+
+    with pytest.raises(GenerationError):
+        generate_parallel(unpicklable, 3, workers=1)
+
+
+@parametrize(count=4)
+def test_random_access_examples(strategy: typing.Literal["chained", "indexed"]):
+    model = dict[str, tuple[FullArgSpec, list[int]]]
+    builds: list[int] = []
+
+    def build() -> Iterator:
+        builds.append(1)
+        return generate(model)
+
+    sequential = [
+        v
+        for _, v in zip(
+            range(8),
+            gen.wrap_deterministically(
+                generate(model), seed=3, max_iterations=10000, strategy=strategy
+            ),
+        )
+    ]
+    examples = _RandomAccessExamples(build)
+    for index in (5, 2, 2, 7, 0, 1):
+        assert examples.at(index, 3, 10000, strategy, "mersenne") == sequential[index]
+    assert len(builds) == 1
+
+    assert examples.at(3, 3, 0, strategy, "mersenne") is None
+    assert examples.at(4, 3, 10000, strategy, "mersenne") == sequential[4]
+    assert len(builds) == 2
+
+
+def test_xdist_workers_only_generate_their_own_cases(
+    pytester: pytest.Pytester, pytestconfig: pytest.Config
+):
+    pytest.importorskip("xdist")
+    path = pytester.makepyfile(
+        """
+        from johen.pytest import parametrize
+
+        @parametrize(count=12)
+        def test_a(a: dict[str, list[int]], b: tuple[int, str]):
+            pass
+
+        @parametrize(count=7)
+        def test_b(a: list[float]):
+            pass
+        """
+    )
+    plugin_args = [] if pytestconfig.pluginmanager.has_plugin("johen") else ["-p", "johen.pytest"]
+
+    def generated(*args: str, passed: int = 19) -> list[str]:
+        result = pytester.runpytest_subprocess(*plugin_args, *args)
+        result.assert_outcomes(passed=passed)
+        return [line for line in result.outlines if line.startswith("johen: generated")]
+
+    serial = generated()
+    assert serial and serial[0].startswith("johen: generated 19 examples")
+    assert generated("-n", "2")[0].startswith("johen: generated 19 examples")
+    assert generated(f"{path.name}::test_a[3]", passed=1)[0].startswith(
+        "johen: generated 1 examples"
+    )
+
+
+@parametrize(count=3, arg_set=("a",))
+def test_cases_are_collected_as_lazy_items(a: list[int], request: pytest.FixtureRequest):
+    assert isinstance(request.node, JohenFunction)
+    assert request.node.name == f"test_cases_are_collected_as_lazy_items[{request.node.case.index}]"
+    assert all(isinstance(v, int) for v in a)
+
+
+@pytest.mark.parametrize("flag", [True, False])
+@parametrize(count=2, arg_set=("a",))
+def test_cases_combine_with_other_parametrization(
+    a: int, flag: bool, request: pytest.FixtureRequest
+):
+    assert not isinstance(request.node, JohenFunction)
+    assert isinstance(a, int) and isinstance(flag, bool)
+
+
+def test_corpus_cache(tmp_path, pytester: pytest.Pytester, pytestconfig: pytest.Config):
+    @dataclasses.dataclass
+    class Model:
+        a: int
+        b: list[FullArgSpec]
+
+    assert fingerprint(Model, dict[str, Model]) == fingerprint(Model, dict[str, Model])
+    assert fingerprint(Model) != fingerprint(dict[str, Model])
+    key = fingerprint(Model)
+    Model.__annotations__["a"] = str
+    assert fingerprint(Model) != key
+
+    # Iterators are described by their functions' code, constants and closures.
+    assert fingerprint({int: ints}) != fingerprint({int: unsigned_ints})
+    assert fingerprint(map(lambda r: r.randint(0, 1), gen)) != fingerprint(
+        map(lambda r: r.randint(0, 2), gen)
+    )
+    assert fingerprint(gen.one_of([1], [2])) != fingerprint(gen.one_of([1], [3]))
+    assert fingerprint(gen.one_of([1], [2])) == fingerprint(gen.one_of([1], [2]))
+    assert fingerprint({int: threading.Lock()}) is None
+
+    # Generators are described by their closure, and not by how far they were advanced.
+    def shifted(offset: float) -> Iterator[float]:
+        return (r.random() + offset for r in gen)
+
+    source = shifted(1)
+    key = fingerprint(source)
+    with GenerationSession(remaining_iterations=10):
+        next(source)
+    assert fingerprint(source) == key
+    assert fingerprint(shifted(2)) != key
+
+    cache = CorpusCache(tmp_path, max_bytes=100)
+    cache.store("a", {0: b"x" * 60})
+    cache.store("a", {1: b"y" * 10})
+    assert cache.load("a") == {0: b"x" * 60, 1: b"y" * 10}
+    cache.store("b", {0: b"z" * 60})
+    assert cache.load("a") == {}
+    assert cache.load("b") == {0: b"z" * 60}
+    # Concurrent writers each keep their own file, merged on load.
+    workers = [CorpusCache(tmp_path / "workers") for _ in range(2)]
+    workers[0].store("a", {0: b"x"})
+    workers[1].store("a", {1: b"y"})
+    assert workers[0].load("a") == {0: b"x", 1: b"y"}
+
+    def corpus_key(**config: Any) -> str | None:
+        def test(a: JsonValue):
+            pass
+
+        (mark,) = parametrize(count=2, **config)(test).pytestmark
+        return mark.args[2].corpus_key
+
+    assert corpus_key(size=5) == corpus_key(size=5)
+    assert corpus_key(size=5) != corpus_key(size=6)
+    assert corpus_key(union_weights={int: 2}) != corpus_key(union_weights={int: 3})
+
+    pytester.makepyfile(
+        """
+        import dataclasses
+        from johen.pytest import parametrize
+
+        @dataclasses.dataclass
+        class Model:
+            a: int
+            b: list[str]
+
+        @parametrize(count=5)
+        def test_a(a: Model, b: dict[str, int]):
+            pass
+
+        def local_model():
+            @dataclasses.dataclass
+            class Unpicklable:
+                a: int
+
+            return Unpicklable
+
+        @parametrize(count=3)
+        def test_b(f: local_model()):
+            assert isinstance(f.a, int)
+        """
+    )
+    plugin_args = [] if pytestconfig.pluginmanager.has_plugin("johen") else ["-p", "johen.pytest"]
+
+    def summary(*args: str) -> str:
+        result = pytester.runpytest_subprocess(*plugin_args, *args)
+        result.assert_outcomes(passed=8)
+        return next(line for line in result.outlines if line.startswith("johen: generated"))
+
+    assert "generated 8 examples" in summary()
+    assert not (pytester.path / ".pytest_cache" / "d" / "johen").exists()
+    assert "generated 8 examples" in summary("--johen-cache")
+    assert "generated 3 examples" in summary("--johen-cache")
+    assert "5 loaded from cache" in summary("--johen-cache")
+    assert "generated 8 examples" in summary("--johen-cache", "--johen-cache-clear")
+    assert "0 loaded from cache" in summary()
+
+
+def test_sometimes_records_bitsets_by_example_index():
+    recorder = Sometimes()
+    for index in range(70):
+        gen.restart_at_index(1, index)
+        for v in range(3):
+            recorder(v == index % 3)
+
+    assert len(recorder.calls) == 1
+    ((code, lineno), (hits, misses)) = next(iter(recorder.calls.items()))
+    assert code is test_sometimes_records_bitsets_by_example_index.__code__
+    assert hits.bit_count() == 70
+    assert misses.bit_count() == 70
+
+
+def test_generation_profiler():
+    @dataclasses.dataclass
+    class Model:
+        a: int
+        b: list[FullArgSpec]
+
+    values = list(generate(Model, seed=1, count=5))
+    with profiler.profile():
+        profiler.clear()
+        assert list(generate(Model, seed=1, count=5)) == values
+    assert list(generate(Model, seed=1, count=5)) == values
+
+    stats = profiler.stats
+    root = stats[repr(Model)]
+    assert root.values >= 5
+    assert root.draws >= root.self_draws
+    assert stats[f"{Model!r} a"].values == root.values
+    assert root.seconds >= stats[f"{Model!r} b"].seconds
+    assert root.draws == root.self_draws + sum(stats[f"{Model!r} {k}"].draws for k in "ab")
+
+    merged = GenerationProfiler()
+    merged.merge(profiler.as_dict())
+    merged.merge(profiler.as_dict())
+    assert merged.stats[repr(Model)].values == root.values * 2
+    profiler.clear()
+
+    # Captures only record the generations of their own thread, and leave the accumulated stats alone.
+    with profiler.capture() as captured:
+        with concurrent.futures.ThreadPoolExecutor(1) as pool:
+            pool.submit(lambda: list(generate(dict[str, int], count=5))).result()
+        list(generate(Model, count=2))
+    assert repr(Model) in captured and repr(dict[str, int]) not in captured
+    assert not profiler.stats
+
+
+def test_budget_exhaustion_is_explained():
+    def build() -> Iterator:
+        return generation_context(dict[str, list[FullArgSpec]]).generate()
+
+    explanation = explain_exhaustion(build, seed=1, index=3, max_iterations=40)
+    assert explanation.startswith("used 40 of max_iterations=40 draws")
+    assert "at depth 4: dict[str, list[johen.generators.base.FullArgSpec]] [Value] " in explanation
+    assert not profiler.stats
+
+    def test(a: FullArgSpec):
+        pass
+
+    (mark,) = parametrize(max_iterations=5)(test).pytestmark
+    with pytest.raises(GenerationError, match="top consumers"):
+        mark.args[2].resolve(3)
+
+    # Constrained collections end cleanly, at the paths of their unconstrained counterparts.
+    for annotation in (
+        Annotated[list[int], at.MinLen(5)],
+        Annotated[set[bool], at.MinLen(3)],
+        Annotated[dict[bool, int], at.MinLen(3)],
+    ):
+        explanation = explain_exhaustion(
+            lambda: generation_context(annotation).generate(), seed=1, index=0, max_iterations=4
+        )
+        assert explanation.startswith("used 4 of max_iterations=4 draws")
+    assert "[Key]" in explanation
+
+    def constrained(a: Annotated[list[int], at.MinLen(5)]):
+        pass
+
+    (mark,) = parametrize(max_iterations=4)(constrained).pytestmark
+    with pytest.raises(GenerationError, match="top consumers"):
+        mark.args[2].resolve(0)
+
+
+class Slow:
+    pass
+
+
+def generate_slow(context: AnnotationProcessingContext) -> Iterator[Slow] | None:
+    if context.source is Slow:
+        return map(lambda r: (time.sleep(0.002), Slow())[1], gen)
+    return None
+
+
+def test_time_budgets():
+    model = dict[str, list[Slow]]
+    iterator = gen.wrap_deterministically(
+        generation_context(model, matchers=[generate_slow]).generate(),
+        seed=1,
+        max_iterations=10000,
+        max_example_seconds=0.005,
+    )
+    with pytest.raises(GenerationTimeout) as e:
+        for _ in range(20):
+            next(iterator)
+    assert e.value.path == (repr(model), "[Value]")
+
+    def test(a: model):
+        pass
+
+    (mark,) = parametrize(max_test_seconds=0.02, matchers=[generate_slow])(test).pytestmark
+    with pytest.raises(GenerationTimeout, match="for test case [0-9]+ of test"):
+        for index in range(20):
+            mark.args[2].resolve(index)
+
+    config = {**global_config, "max_example_seconds": 0.005, "max_iterations": 10000}
+    with replace_global_config(config):
+        with pytest.raises(GenerationTimeout):
+            generate(model, count=20, matchers=[generate_slow])
+        with pytest.raises(GenerationTimeout):
+            for _ in zip(range(20), generate(model, seed=1, matchers=[generate_slow])):
+                pass
+    # The deadline of each example is lifted once it is generated.
+    assert gen.session.deadline is None
+
+
+def test_recursive_values_are_sized():
+    def nodes(value: JsonValue) -> int:
+        if isinstance(value, dict):
+            return 1 + sum(nodes(v) for v in value.values())
+        if isinstance(value, list):
+            return 1 + sum(nodes(v) for v in value)
+        return 1
+
+    globals = {"JsonDict": JsonDict, "JsonValue": JsonValue}
+    for size in (1, 5, 30):
+        with replace_global_config({**global_config, "size": size}):
+            sizes = [nodes(v) for v in generate(JsonValue, seed=1, count=500, globals=globals)]
+        assert max(sizes) <= size
+        assert size == 1 or max(sizes) > size // 2
+
+
+def test_forward_refs_are_resolved_once_per_globals():
+    globals = {"JsonDict": JsonDict, "JsonValue": JsonValue}
+    ref = typing.ForwardRef("JsonValue")
+    assert resolve_forward_ref(ref, globals) is JsonValue
+    assert resolve_forward_ref(typing.ForwardRef("JsonValue"), globals) is JsonValue
+
+    globals["JsonValue"] = "JsonDict"
+    assert resolve_forward_ref(ref, globals) == typing.ForwardRef("JsonDict")
+    assert all(isinstance(v, dict) for v in generate(ref, count=20, globals=globals))
+
+
+def test_union_members_are_built_when_first_picked():
+    # Building the generator of the unresolvable forward ref raises, so it must never be built.
+    with replace_global_config({**global_config, "union_weights": {"Missing": 0}}):
+        assert all(isinstance(v, int) for v in generate(typing.Union[int, "Missing"], count=50))
+    with pytest.raises(GenerationError):
+        list(generate(typing.Union[int, "Missing"], count=50))
+
+    with replace_global_config({**global_config, "union_weights": {None: 0}}):
+        assert None not in generate(int | None, count=50)
+    with replace_global_config({**global_config, "union_weights": {int: 0}}):
+        assert set(generate(int | None, count=50)) == {None}
+    with replace_global_config({**global_config, "union_weights": {int: 9}}):
+        assert 0 < list(generate(int | None, count=200)).count(None) < 50
+
+
+def test_alias_table():
+    weights = [0.5, 3, 0, 1.5, 5]
+    table = AliasTable.from_weights(weights)
+    # The exact probability of each index is its own column's share plus what other columns alias to it.
+    probabilities = [table.probabilities[i] / table.size for i in range(table.size)]
+    for i in range(table.size + 1):
+        if table.aliases[i] != i and i < table.size:
+            probabilities[table.aliases[i]] += (1 - table.probabilities[i]) / table.size
+    assert probabilities == pytest.approx([w / sum(weights) for w in weights])
+
+    class Fixed(random.Random):
+        def __init__(self, value: float):
+            super().__init__()
+            self.value = value
+
+        def random(self) -> float:
+            return self.value
+
+    # Should rounding make `random() * size` reach size, the pick is that of the largest possible draw.
+    assert table.pick(Fixed(1.0)) == table.pick(Fixed(math.nextafter(1.0, 0)))
+    with pytest.raises(ValueError):
+        AliasTable.from_weights([0, 0])
+
+    with GenerationSession() as session:
+        session.restart_at_index(1, 0)
+        session.remaining_iterations = 10000
+        values = [
+            v for v, _ in zip(gen.frequency((9, ["a"]), (1, itertools.repeat("b"))), range(1000))
+        ]
+    assert 0 < values.count("b") < 200
+
+
+def test_constrained_generation():
+    cases: list[tuple[Any, typing.Callable[[Any], bool]]] = [
+        (
+            Annotated[int, at.Ge(10**12), at.Lt(10**12 + 3)],
+            lambda v: 10**12 <= v < 10**12 + 3,
+        ),
+        (
+            Annotated[int, at.MultipleOf(7), at.Interval(gt=-30, le=28)],
+            lambda v: v % 7 == 0 and -30 < v <= 28,
+        ),
+        (Annotated[float, at.Interval(gt=0, lt=1e-9)], lambda v: 0 < v < 1e-9),
+        (Annotated[float, at.Le(-5)], lambda v: v <= -5),
+        (Annotated[str, at.Len(3, 4)], lambda v: 3 <= len(v) <= 4),
+        (Annotated[set[int], at.MinLen(6)], lambda v: len(v) >= 6),
+        (Annotated[dict[str, int], at.Len(2, 2)], lambda v: len(v) == 2),
+        (
+            Annotated[
+                datetime.date, at.Gt(datetime.date(2020, 1, 1)), at.Le(datetime.date(2020, 1, 3))
+            ],
+            lambda v: datetime.date(2020, 1, 1) < v <= datetime.date(2020, 1, 3),
+        ),
+        (Annotated[int | None, at.Gt(0), at.Lt(3)], lambda v: v is None or 0 < v < 3),
+        (
+            Annotated[int, at.Ge(0), at.Le(10), at.Predicate(lambda v: v % 2 == 0)],
+            lambda v: v % 2 == 0,
+        ),
+        (
+            Annotated[float, at.MultipleOf(0.25), at.Ge(0.25), at.Le(0.75)],
+            lambda v: v in (0.25, 0.5, 0.75),
+        ),
+        (Annotated[int, at.MultipleOf(-3), at.Gt(2.5), at.Lt(7)], lambda v: v == 3 or v == 6),
+    ]
+    for annotation, check in cases:
+        values = list(generate(annotation, count=100))
+        assert all(check(v) for v in values), annotation
+
+    # Metadata that is not a constraint does not hide the others.
+    constraints = Constraints.from_metadata([at.Ge(3), at.Le(4), "doc"])
+    assert constraints is not None and constraints.int_bounds() == (3, 4)
+
+    # Tight bounds are sampled within, rather than by rejection.
+    with replace_global_config({**global_config, "max_iterations": 300}):
+        assert len(list(generate(Annotated[float, at.Interval(gt=0, lt=1e-9)], count=100))) == 100
+
+    for annotation in (
+        Annotated[int, at.Gt(1), at.Lt(2)],
+        Annotated[float, at.MultipleOf(0.5), at.Gt(0), at.Lt(0.5)],
+        Annotated[int, at.MultipleOf(0.5)],
+    ):
+        with pytest.raises(GenerationError):
+            list(generate(annotation, count=1))
+
+    class Model(pydantic.BaseModel):
+        a: int = pydantic.Field(ge=3, le=5)
+        b: Annotated[str, pydantic.Field(min_length=2, max_length=4)]
+        c: Annotated[int, Examples([1, 2])]
+        d: list[int] = pydantic.Field(max_length=3)
+        e: float = pydantic.Field(multiple_of=0.5, gt=0, lt=1)
+
+    models = generate(Model, count=50, matchers=[generate_pydantic_instances])
+    assert all(m.c in (1, 2) and m.e == 0.5 for m in models)
+
+
+def test_generate_batch():
+    class Point(typing.NamedTuple):
+        x: int
+        y: typing.Literal["a", "b"]
+
+    @dataclasses.dataclass
+    class Row:
+        point: Point
+        tags: set[str]
+        maybe: datetime.date | None
+        pairs: dict[int, tuple[bool, ...]]
+        word: SimpleSymbol
+        json: JsonValue
+        optional: int = 0
+
+    globals = {"JsonDict": JsonDict, "JsonValue": JsonValue}
+    rows = generate_batch(Row, 200, seed=1, generate_defaults="holes", globals=globals)
+    assert rows == generate_batch(Row, 200, seed=1, generate_defaults="holes", globals=globals)
+    assert rows != generate_batch(Row, 200, seed=2, generate_defaults="holes", globals=globals)
+    assert len(rows) == 200
+    assert all(isinstance(r.point, Point) and r.point.y in ("a", "b") for r in rows)
+    assert all(isinstance(t, str) for r in rows for t in r.tags)
+    assert any(r.maybe is None for r in rows) and any(r.maybe is not None for r in rows)
+    assert all(len(r.word) == 5 for r in rows)
+    assert any(r.optional != 0 for r in rows) and any(r.optional == 0 for r in rows)
+
+    # Custom type matchers are respected, generated one value at a time.
+    with replace_global_config({**global_config, "type_matchers": {int: itertools.repeat(7)}}):
+        assert {p.x for p in generate_batch(Point, 20)} == {7}
+
+    with replace_global_config({**global_config, "union_weights": {None: 0, datetime.date: 0}}):
+        with pytest.raises(GenerationError, match="Invalid union weights"):
+            generate_batch(Row, 20, globals=globals)
+
+
+def test_generate_columns():
+    class Row(typing.TypedDict, total=False):
+        score: float
+        flag: bool
+        count: int
+        name: str
+        tags: list[str]
+
+    rows = generate_batch(Row, 100, seed=4, generate_defaults="holes")
+    columns = generate_columns(Row, 100, seed=4, generate_defaults="holes")
+    assert columns.length == 100
+    assert isinstance(columns.columns["score"], array.array)
+    assert isinstance(columns.columns["flag"], array.array)
+    assert isinstance(columns.columns["tags"], list)
+    # The same draws as generate_batch, holes included.
+    for i, row in enumerate(rows):
+        assert row == {
+            k: (bool(c[i]) if k == "flag" else c[i])
+            for k, c in columns.columns.items()
+            if columns.masks[k][i]
+        }
+
+    columns = generate_columns(Row, 10, seed=4)
+    assert set(columns.columns) == set() and columns.masks == {}
+
+    with pytest.raises(GenerationError):
+        generate_columns(list[int], 10)
+
+    pytest.importorskip("numpy")
+
+    @dataclasses.dataclass
+    class Event:
+        at: datetime.datetime
+        value: float
+        label: str
+        id: uuid.UUID
+
+    events = generate_columns(Event, 50, seed=1, backend="numpy")
+    assert events.columns["at"].dtype.kind == "M" and len(events.columns["at"]) == 50
+    assert events.columns["value"].dtype == float
+    assert isinstance(events.columns["label"], list)
+    assert len(events.columns["id"]) == 50
+    assert all(isinstance(u, uuid.UUID) for u in events.columns["id"])
+    assert (
+        events.columns["value"]
+        == generate_columns(Event, 50, seed=1, backend="numpy").columns["value"]
+    ).all()
+
+
+def test_vectorized_primitives():
+    numpy = pytest.importorskip("numpy")
+    from johen.generators import vectorized
+
+    @dataclasses.dataclass
+    class Row:
+        a: int
+        b: float
+        c: uuid.UUID
+        d: datetime.datetime
+        e: list[bool]
+
+    with replace_global_config({**global_config, "type_matchers": vectorized.type_matchers}):
+        rows = list(generate(Row, seed=1, count=100))
+        assert list(generate(Row, seed=1, count=100)) == rows
+        assert all(isinstance(r.a, int) and isinstance(r.c, uuid.UUID) for r in rows)
+
+        # Buffers are dropped between examples, so each only depends on its own seed.
+        def examples(start: int) -> Iterator[Row]:
+            return gen.wrap_deterministically(
+                generate_dicts_for_annotations({"row": Row}, generation_context(Row), []),
+                seed=3,
+                max_iterations=1000,
+                start=start,
+                strategy="indexed",
+            )
+
+        assert list(itertools.islice(examples(0), 20))[17] == next(examples(17))
+
+    rng = numpy.random.default_rng(0)
+    floats = vectorized.valid_float_array(rng, 1000)
+    assert floats.dtype == numpy.float64 and len(floats) == 1000 and numpy.isfinite(floats).all()
+    assert all(u.version == 4 for u in vectorized._uuids(vectorized.uuid_array(rng, 100)))
+
+
+def test_numpy_arrays():
+    numpy = pytest.importorskip("numpy")
+    import numpy.typing as npt
+
+    from johen.generators.numpy import Shape, generate_arrays
+
+    def arrays(annotation: typing.Any) -> list[typing.Any]:
+        return list(generate(annotation, count=30, seed=1, matchers=[generate_arrays]))
+
+    floats = arrays(npt.NDArray[numpy.float64])
+    assert all(a.dtype == numpy.float64 and a.ndim == 1 and len(a) <= 5 for a in floats)
+    assert len({len(a) for a in floats}) > 1
+    assert all((a == b).all() for a, b in zip(floats, arrays(npt.NDArray[numpy.float64])))
+
+    # Metadata applies in any order, along with metadata that is not a constraint.
+    bounded = arrays(Annotated[npt.NDArray[numpy.float32], at.Gt(0), Shape(3, None), at.Lt(1)])
+    assert all(a.dtype == numpy.float32 and a.shape[0] == 3 for a in bounded)
+    assert all(((a > 0) & (a < 1)).all() for a in bounded)
+    # Exclusive bounds hold at magnitudes where drawing and casting round onto them.
+    for a in arrays(Annotated[npt.NDArray[numpy.float32], at.Lt(1e10)]):
+        assert (a < 1e10).all()
+    for a in arrays(Annotated[npt.NDArray[numpy.float32], at.Gt(-1e10)]):
+        assert (a > -1e10).all()
+    for a in arrays(Annotated[npt.NDArray[numpy.int8], Shape(4), at.Ge(-9), at.MultipleOf(3)]):
+        assert a.dtype == numpy.int8 and a.shape == (4,)
+        assert (a >= -9).all() and (a % 3 == 0).all()
+    quarters = arrays(
+        Annotated[npt.NDArray[numpy.float64], at.MultipleOf(0.25), at.Ge(0), at.Le(1)]
+    )
+    assert all(numpy.isin(a, [0, 0.25, 0.5, 0.75, 1]).all() for a in quarters)
+
+    assert all(a.dtype.kind == "M" for a in arrays(npt.NDArray[numpy.datetime64]))
+    assert all(a.dtype == numpy.dtype("<U5") for a in arrays(npt.NDArray[numpy.str_]))
+    assert all(isinstance(s, numpy.uint16) for s in arrays(numpy.uint16))
+
+    for annotation in (
+        Annotated[npt.NDArray[numpy.uint8], at.Gt(255)],
+        Annotated[npt.NDArray[numpy.int8], at.MultipleOf(0.5)],
+        Annotated[npt.NDArray[numpy.float64], at.MultipleOf(0.5), at.Gt(0), at.Lt(0.5)],
+    ):
+        with pytest.raises(GenerationError):
+            arrays(annotation)
+
+
+def test_pandas_data_frames():
+    pytest.importorskip("pandas")
+    import pandas
+
+    from johen.generators.pandas import generate_data_frames
+
+    @dataclasses.dataclass
+    class Row:
+        at: datetime.datetime
+        value: float
+        name: str
+        note: str | None = None
+
+    frames = list(
+        generate(
+            Annotated[pandas.DataFrame, Row, at.Len(3, 8)],
+            count=20,
+            seed=1,
+            matchers=[generate_data_frames],
+            generate_defaults="holes",
+        )
+    )
+    assert all(list(f.columns) == ["at", "value", "name", "note"] for f in frames)
+    assert all(3 <= len(f) <= 8 for f in frames)
+    assert all(f["at"].dtype.kind == "M" and f["value"].dtype.kind == "f" for f in frames)
+    assert any(f["note"].isna().any() for f in frames)
+
+
+def test_cli(tmp_path, capsysbinary: pytest.CaptureFixture[bytes], monkeypatch: pytest.MonkeyPatch):
+    from johen.cli import main
+
+    def run(*args: str) -> bytes:
+        output = tmp_path / "out"
+        assert (
+            main(["johen.parallel:ShardReport", "-n", "20", "-s", "3", "-o", str(output), *args])
+            == 0
+        )
+        return output.read_bytes()
+
+    lines = run().splitlines()
+    assert len(lines) == 20
+    assert set(json.loads(lines[0])) == {
+        "pid",
+        "start",
+        "stop",
+        "generate_seconds",
+        "pickle_seconds",
+    }
+    # The output does not depend on the number of workers.
+    assert run("-w", "2", "--shard-size", "3") == b"\n".join(lines) + b"\n"
+
+    assert main(["johen.parallel:ShardReport", "-n", "5", "-f", "csv"]) == 0
+    rows = list(csv.DictReader(capsysbinary.readouterr().out.decode().splitlines()))
+    assert len(rows) == 5 and list(rows[0]) == [
+        "pid",
+        "start",
+        "stop",
+        "generate_seconds",
+        "pickle_seconds",
+    ]
+
+    msgpack = pytest.importorskip("msgpack")
+    assert [r["pid"] for r in msgpack.Unpacker(io.BytesIO(run("-f", "msgpack")))] == [
+        json.loads(line)["pid"] for line in lines
+    ]
+
+    # Headers come from the model, holes are left empty.
+    (tmp_path / "cli_models.py").write_text(
+        "import typing\n"
+        "from johen.generators.specialized import negative_ints\n"
+        "class Row(typing.TypedDict, total=False):\n"
+        "    a: int\n"
+        "    b: str\n"
+        "class Big(typing.TypedDict):\n"
+        "    a: typing.Annotated[int, negative_ints]\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(tmp_path)
+    capsysbinary.readouterr()
+    assert main(["cli_models:Row", "-n", "30", "-f", "csv", "--generate-defaults", "holes"]) == 0
+    rows = list(csv.DictReader(capsysbinary.readouterr().out.decode().splitlines()))
+    assert len(rows) == 30 and all(list(row) == ["a", "b"] for row in rows)
+    assert any(row["a"] == "" for row in rows)
+
+    assert main(["cli_models:Big", "-n", "200", "-f", "msgpack"]) == 0
+    big = [r["a"] for r in msgpack.Unpacker(io.BytesIO(capsysbinary.readouterr().out))]
+    assert len(big) == 200 and any(isinstance(a, str) and int(a) < -(2**63) for a in big)
+
+    with pytest.raises(SystemExit):
+        main(["johen.nothing:Model"])